@@ -5,172 +5,227 @@ Uses Shapely's simplify method with a 250m tolerance to reduce coordinate
 density while preserving the essential shape of railway lines.
 """
 
-import json
 import os
-from typing import Dict, Any
-from shapely.geometry import LineString
-import pyproj
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Any, Tuple
+import numpy as np
+import shapely
+from tqdm import tqdm
+from shapely.geometry import mapping
+from geojson_io import FeatureCollectionWriter, batched, iter_features
 
 # Configuration
 INPUT_FILE = "china/railways_combined_polylines.geojson"
 OUTPUT_FILE = "china/railways_ways_downsampled_simple_algorithm.geojson"
 TOLERANCE_METERS = 500  # Douglas-Peucker tolerance in meters
+BATCH_SIZE = 10000  # Number of features simplified per vectorized call
+MAX_WORKERS = None  # Worker processes for simplification (None = all CPUs)
 
-# Coordinate system for distance calculations (WGS84)
-WGS84 = pyproj.CRS("EPSG:4326")
-# Use a projected coordinate system for accurate distance calculations
-# Using UTM Zone 49N (covers Guangzhou area)
-UTM_PROJECTION = pyproj.CRS("EPSG:32649")  # UTM Zone 49N
+# WGS84 ellipsoid, used to convert degrees to local meters per geometry
+WGS84_SEMI_MAJOR_AXIS = 6378137.0
+WGS84_FLATTENING = 1 / 298.257223563
+# Lower bound for cos(latitude) so longitudes stay usable near the poles
+MIN_LONGITUDE_SCALE = 0.1
 
 
-def transform_coordinates(geometry_dict: Dict[str, Any]) -> Dict[str, Any]:
+def _simplify_batches(
+    batches: Iterable[List[Dict[str, Any]]],
+    executor: ProcessPoolExecutor,
+    max_pending: int,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
     """
-    Transform coordinates from WGS84 to UTM for accurate distance calculations.
+    Simplify batches of features in worker processes, yielding each input
+    batch with its simplified features in input order. Only a few batches
+    are in flight at a time so the input is still streamed.
     """
-    if geometry_dict.get("type") == "LineString":
-        coords = geometry_dict.get("coordinates", [])
-
-        # Create transformer from WGS84 to UTM
-        transformer = pyproj.Transformer.from_crs(WGS84, UTM_PROJECTION, always_xy=True)
-
-        # Transform coordinates
-        transformed_coords = []
-        for coord in coords:
-            lon, lat = coord[0], coord[1]
-            x, y = transformer.transform(lon, lat)
-            transformed_coords.append([x, y])
-
-        return {"type": "LineString", "coordinates": transformed_coords}
-    elif geometry_dict.get("type") == "MultiLineString":
-        coords = geometry_dict.get("coordinates", [])
-
-        # Create transformer from WGS84 to UTM
-        transformer = pyproj.Transformer.from_crs(WGS84, UTM_PROJECTION, always_xy=True)
-
-        # Transform coordinates for each line
-        transformed_coords = []
-        for line in coords:
-            transformed_line = []
-            for coord in line:
-                lon, lat = coord[0], coord[1]
-                x, y = transformer.transform(lon, lat)
-                transformed_line.append([x, y])
-            transformed_coords.append(transformed_line)
-
-        return {"type": "MultiLineString", "coordinates": transformed_coords}
-    else:
-        return geometry_dict
-
-
-def transform_coordinates_back(geometry_dict: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Transform coordinates back from UTM to WGS84 for output.
-    """
-    if geometry_dict.get("type") == "LineString":
-        coords = geometry_dict.get("coordinates", [])
-
-        # Create transformer from UTM to WGS84
-        transformer = pyproj.Transformer.from_crs(UTM_PROJECTION, WGS84, always_xy=True)
-
-        # Transform coordinates back
-        transformed_coords = []
-        for coord in coords:
-            x, y = coord[0], coord[1]
-            lon, lat = transformer.transform(x, y)
-            transformed_coords.append([lon, lat])
-
-        return {"type": "LineString", "coordinates": transformed_coords}
-    elif geometry_dict.get("type") == "MultiLineString":
-        coords = geometry_dict.get("coordinates", [])
-
-        # Create transformer from UTM to WGS84
-        transformer = pyproj.Transformer.from_crs(UTM_PROJECTION, WGS84, always_xy=True)
-
-        # Transform coordinates back for each line
-        transformed_coords = []
-        for line in coords:
-            transformed_line = []
-            for coord in line:
-                x, y = coord[0], coord[1]
-                lon, lat = transformer.transform(x, y)
-                transformed_line.append([lon, lat])
-            transformed_coords.append(transformed_line)
-
-        return {"type": "MultiLineString", "coordinates": transformed_coords}
-    else:
-        return geometry_dict
-
-
-def simplify_geometry(
-    geometry_dict: Dict[str, Any], tolerance_meters: float
-) -> Dict[str, Any]:
-    """
-    Apply Douglas-Peucker simplification to a geometry.
-    """
-    if geometry_dict.get("type") == "LineString":
-        coords = geometry_dict.get("coordinates", [])
+    pending = deque()
 
-        # Skip if less than 3 points (can't simplify)
-        if len(coords) < 3:
-            return geometry_dict
+    for batch in batches:
+        future = executor.submit(simplify_features, batch, TOLERANCE_METERS)
+        pending.append((batch, future))
 
-        # Create LineString and simplify
-        line = LineString(coords)
-        simplified_line = line.simplify(tolerance_meters, preserve_topology=True)
+        if len(pending) >= max_pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
 
-        # Convert back to coordinate list
-        if simplified_line.is_empty:
-            return geometry_dict
+    while pending:
+        batch, future = pending.popleft()
+        yield batch, future.result()
 
-        simplified_coords = list(simplified_line.coords)
 
-        return {"type": "LineString", "coordinates": simplified_coords}
-
-    elif geometry_dict.get("type") == "MultiLineString":
-        coords = geometry_dict.get("coordinates", [])
-        simplified_coords = []
+def _meters_per_degree(latitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the length in meters of one degree of longitude and of latitude at
+    the given latitudes on the WGS84 ellipsoid.
+    """
+    e2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    phi = np.radians(latitudes)
+    w = np.sqrt(1 - e2 * np.sin(phi) ** 2)
 
-        for line_coords in coords:
-            if len(line_coords) < 3:
-                simplified_coords.append(line_coords)
-                continue
+    # Prime vertical and meridional radii of curvature
+    prime_vertical = WGS84_SEMI_MAJOR_AXIS / w
+    meridional = WGS84_SEMI_MAJOR_AXIS * (1 - e2) / w**3
 
-            # Create LineString and simplify
-            line = LineString(line_coords)
-            simplified_line = line.simplify(tolerance_meters, preserve_topology=True)
+    cos_phi = np.maximum(MIN_LONGITUDE_SCALE, np.cos(phi))
+    return np.radians(prime_vertical * cos_phi), np.radians(meridional)
 
-            if simplified_line.is_empty:
-                simplified_coords.append(line_coords)
-            else:
-                simplified_coords.append(list(simplified_line.coords))
 
-        return {"type": "MultiLineString", "coordinates": simplified_coords}
+def _is_simplifiable(geometry: Dict[str, Any]) -> bool:
+    """
+    Check if a geometry is a line type that Shapely can build and simplify.
+    """
+    geometry_type = geometry.get("type")
+    coords = geometry.get("coordinates", [])
 
-    else:
-        return geometry_dict
+    if geometry_type == "LineString":
+        return len(coords) >= 2
+    elif geometry_type == "MultiLineString":
+        # Parts with fewer than 2 points are passed through unchanged
+        return any(len(line) >= 2 for line in coords)
+    return False
 
 
-def process_feature(feature: Dict[str, Any], tolerance_meters: float) -> Dict[str, Any]:
+def _count_coords(geometry: Dict[str, Any]) -> int:
     """
-    Process a single feature by applying Douglas-Peucker simplification.
+    Count the coordinates of a LineString or MultiLineString geometry.
     """
-    geometry = feature.get("geometry", {})
-    properties = feature.get("properties", {})
+    geometry_type = geometry.get("type")
+    coords = geometry.get("coordinates", [])
 
-    # Transform to UTM for accurate distance calculations
-    utm_geometry = transform_coordinates(geometry)
+    if geometry_type == "LineString":
+        return len(coords)
+    elif geometry_type == "MultiLineString":
+        return sum(len(line) for line in coords)
+    return 0
 
-    # Apply Douglas-Peucker simplification
-    simplified_utm_geometry = simplify_geometry(utm_geometry, tolerance_meters)
 
-    # Transform back to WGS84
-    simplified_geometry = transform_coordinates_back(simplified_utm_geometry)
+def _restore_short_parts(
+    original_parts: List[Any], simplified_parts: Iterable[Any]
+) -> List[Any]:
+    """
+    Put the MultiLineString parts with fewer than 2 points, which were not
+    simplified, back among the simplified parts in their original order.
+    If simplification dropped a part the order cannot be matched, so the
+    short parts are appended after the simplified ones instead.
+    """
+    simplified_parts = list(simplified_parts)
+    if len(simplified_parts) != sum(len(line) >= 2 for line in original_parts):
+        return simplified_parts + [line for line in original_parts if len(line) < 2]
 
-    return {
-        "type": "Feature",
-        "geometry": simplified_geometry,
-        "properties": properties,
-    }
+    simplified_iter = iter(simplified_parts)
+    return [
+        next(simplified_iter) if len(line) >= 2 else line for line in original_parts
+    ]
+
+
+def simplify_features(
+    features: List[Dict[str, Any]], tolerance_meters: float
+) -> List[Dict[str, Any]]:
+    """
+    Apply Douglas-Peucker simplification to all line features at once.
+    Each geometry is scaled to local meters at its mean latitude, so the
+    tolerance is the same distance in both directions.
+    """
+    line_indices = [
+        i
+        for i, feature in enumerate(features)
+        if _is_simplifiable(feature.get("geometry") or {})
+    ]
+
+    # Flatten every line into one contiguous coordinate array, with the
+    # owning geometry of each line and coordinate tracked alongside it.
+    # MultiLineString parts with fewer than 2 points are left out and put
+    # back unchanged after simplification.
+    lines = []
+    line_owner = []
+    is_multi = np.zeros(len(line_indices), dtype=bool)
+    short_parts = {}
+    for k, i in enumerate(line_indices):
+        geometry = features[i]["geometry"]
+        if geometry["type"] == "MultiLineString":
+            is_multi[k] = True
+            parts = [line for line in geometry["coordinates"] if len(line) >= 2]
+            if len(parts) < len(geometry["coordinates"]):
+                short_parts[k] = geometry["coordinates"]
+            lines.extend(parts)
+            line_owner.extend([k] * len(parts))
+        else:
+            lines.append(geometry["coordinates"])
+            line_owner.append(k)
+
+    line_lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    line_owner = np.asarray(line_owner, dtype=np.int64)
+
+    # The flat array below is read back in pairs, so any position that is not
+    # exactly (lon, lat) would shift every later coordinate
+    position_sizes = np.fromiter(
+        map(len, chain.from_iterable(lines)),
+        dtype=np.int64,
+        count=int(line_lengths.sum()),
+    )
+    if (position_sizes < 2).any():
+        raise ValueError("Line positions must have at least 2 values (lon, lat)")
+    if (position_sizes > 2).any():
+        # Drop z and any further values; the output is 2D either way
+        lines = [[position[:2] for position in line] for line in lines]
+
+    coords = np.fromiter(
+        chain.from_iterable(chain.from_iterable(lines)),
+        dtype=np.float64,
+        count=2 * int(line_lengths.sum()),
+    ).reshape(-1, 2)
+    index = np.repeat(line_owner, line_lengths)
+
+    # Scale each geometry to meters at its mean latitude
+    counts = np.bincount(index, minlength=len(line_indices))
+    lat_sums = np.bincount(index, weights=coords[:, 1], minlength=len(line_indices))
+    mean_lat = lat_sums / np.maximum(counts, 1)
+    x_scale, y_scale = _meters_per_degree(mean_lat)
+    coords[:, 0] *= x_scale[index]
+    coords[:, 1] *= y_scale[index]
+
+    # Build all lines in one call, then group the parts of MultiLineStrings
+    line_geoms = shapely.linestrings(
+        coords, indices=np.repeat(np.arange(len(lines)), line_lengths)
+    )
+    geoms = np.empty(len(line_indices), dtype=object)
+    multi_lines = is_multi[line_owner]
+    geoms[~is_multi] = line_geoms[~multi_lines]
+    multi_rank = np.cumsum(is_multi) - 1
+    geoms[is_multi] = shapely.multilinestrings(
+        line_geoms[multi_lines], indices=multi_rank[line_owner[multi_lines]]
+    )
+
+    # Simplify every geometry in one vectorized call
+    simplified = shapely.simplify(geoms, tolerance_meters, preserve_topology=False)
+
+    # Scale back to degrees
+    coords, index = shapely.get_coordinates(simplified, return_index=True)
+    coords[:, 0] /= x_scale[index]
+    coords[:, 1] /= y_scale[index]
+    simplified = shapely.set_coordinates(simplified, coords)
+
+    processed_features = [
+        {
+            "type": "Feature",
+            "geometry": feature.get("geometry"),
+            "properties": feature.get("properties", {}),
+        }
+        for feature in features
+    ]
+    for k, (i, geom) in enumerate(zip(line_indices, simplified)):
+        # Keep the original geometry if simplification fails
+        if not geom.is_empty:
+            geometry = mapping(geom)
+            if k in short_parts and geometry["type"] == "MultiLineString":
+                geometry["coordinates"] = _restore_short_parts(
+                    short_parts[k], geometry["coordinates"]
+                )
+            processed_features[i]["geometry"] = geometry
+
+    return processed_features
 
 
 def downsample_railways():
@@ -190,55 +245,39 @@ def downsample_railways():
         print(f"Error: Input file '{INPUT_FILE}' not found!")
         return
 
-    # Load the GeoJSON data
-    print(f"Loading data from {INPUT_FILE}...")
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    features = data.get("features", [])
-    total_features = len(features)
-    print(f"Loaded {total_features:,} features")
-
-    # Process features
+    # Stream features from the input file in batches and write simplified
+    # features to the output as each batch completes
+    print(f"Streaming features from {INPUT_FILE}...")
+    print(f"Writing output to: {OUTPUT_FILE}")
     print("\nProcessing features with Douglas-Peucker algorithm...")
-    processed_features = []
+    sample_features = []
+    total_features = 0
     original_coord_count = 0
     simplified_coord_count = 0
 
-    for i, feature in enumerate(features):
-        # Progress tracking
-        if i % 1000 == 0 or i == total_features - 1:
-            progress = ((i + 1) / total_features) * 100
-            print(f"  Progress: {progress:.1f}% ({i+1:,}/{total_features:,})")
-
-        # Count original coordinates
-        geometry = feature.get("geometry", {})
-        if geometry.get("type") == "LineString":
-            original_coord_count += len(geometry.get("coordinates", []))
-        elif geometry.get("type") == "MultiLineString":
-            for line_coords in geometry.get("coordinates", []):
-                original_coord_count += len(line_coords)
-
-        # Process feature
-        processed_feature = process_feature(feature, TOLERANCE_METERS)
-        processed_features.append(processed_feature)
-
-        # Count simplified coordinates
-        simplified_geometry = processed_feature.get("geometry", {})
-        if simplified_geometry.get("type") == "LineString":
-            simplified_coord_count += len(simplified_geometry.get("coordinates", []))
-        elif simplified_geometry.get("type") == "MultiLineString":
-            for line_coords in simplified_geometry.get("coordinates", []):
-                simplified_coord_count += len(line_coords)
-
-    # Create output GeoJSON
-    print("\nCreating output file...")
-    output_data = {"type": "FeatureCollection", "features": processed_features}
-
-    # Write output file
-    print(f"Writing output to: {OUTPUT_FILE}")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, separators=(",", ":"))
+    num_workers = MAX_WORKERS or os.cpu_count() or 1
+
+    progress = tqdm(unit=" features")
+
+    with FeatureCollectionWriter(OUTPUT_FILE) as writer, progress:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            batches = batched(iter_features(INPUT_FILE), BATCH_SIZE)
+
+            for features, simplified_features in _simplify_batches(
+                batches, executor, max_pending=2 * num_workers
+            ):
+                total_features += len(features)
+                progress.update(len(features))
+
+                for feature, processed_feature in zip(features, simplified_features):
+                    writer.write(processed_feature)
+                    if len(sample_features) < 3:
+                        sample_features.append(processed_feature)
+
+                    original_coord_count += _count_coords(feature.get("geometry") or {})
+                    simplified_coord_count += _count_coords(
+                        processed_feature.get("geometry") or {}
+                    )
 
     print("✓ Output file created successfully!")
 
@@ -247,7 +286,7 @@ def downsample_railways():
     print("DOUGLAS-PEUCKER DOWNSAMPLE STATISTICS")
     print("=" * 60)
     print(f"Input features: {total_features:,}")
-    print(f"Output features: {len(processed_features):,}")
+    print(f"Output features: {writer.count:,}")
     print(f"Original coordinates: {original_coord_count:,}")
     print(f"Simplified coordinates: {simplified_coord_count:,}")
 
@@ -258,27 +297,20 @@ def downsample_railways():
         print(f"Coordinate reduction: {reduction_pct:.1f}%")
 
     print(f"Tolerance: {TOLERANCE_METERS} meters")
-    print("Algorithm: Douglas-Peucker with topology preservation")
-    print("Coordinate system: UTM Zone 49N for distance calculations")
+    print("Algorithm: Douglas-Peucker (no topology preservation)")
+    print("Coordinate system: WGS84 scaled to local meters per feature")
     print(f"Input file: {INPUT_FILE}")
     print(f"Output file: {OUTPUT_FILE}")
     print("=" * 60)
 
     # Print some examples
     print("\nSample of processed features:")
-    for i, feature in enumerate(processed_features[:3]):
+    for i, feature in enumerate(sample_features):
         props = feature.get("properties", {})
-        geometry = feature.get("geometry", {})
         name = props.get("name", "unnamed")
         railway_type = props.get("railway", "unknown")
         usage = props.get("usage", "unknown")
-
-        coord_count = 0
-        if geometry.get("type") == "LineString":
-            coord_count = len(geometry.get("coordinates", []))
-        elif geometry.get("type") == "MultiLineString":
-            for line_coords in geometry.get("coordinates", []):
-                coord_count += len(line_coords)
+        coord_count = _count_coords(feature.get("geometry") or {})
 
         print(
             f"  {i+1}. {name} ({railway_type}, {usage}) - " f"{coord_count} coordinates"
@@ -8,12 +8,15 @@ Takes railways_ways_downsampled_simple.geojson and applies advanced processing:
 - Property field exclusion
 """
 
-import json
+import orjson
 import os
-import re
+import tempfile
+import numpy as np
+from tqdm import tqdm
 
 # import math  # REMOVED: No longer needed without parallel detection
-from typing import Dict, List, Any
+from typing import Any, BinaryIO, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+from geojson_io import FeatureCollectionWriter, iter_features, round_coordinate_array
 
 # Configuration
 COUNTRY_DIR = "china"
@@ -49,96 +52,91 @@ EXCLUDED_FIELDS = {
 # Languages to keep for name fields (English and Chinese)
 KEEP_LANGUAGES = {"en", "zh", "zh-Hans", "zh-Hant"}
 
+# Name fields to keep: generic 'name' plus 'name:<lang>' for kept languages
+KEEP_NAME_FIELDS = frozenset({"name"} | {f"name:{lang}" for lang in KEEP_LANGUAGES})
+
 # Parallel track detection parameters (REMOVED)
 # PARALLEL_TOLERANCE_METERS = 50  # Max distance between parallel tracks
 # MIN_TRACK_LENGTH_METERS = 100  # Min track length for parallel detection
 # PARALLEL_ANGLE_TOLERANCE_DEGREES = 15  # Max angle difference for parallel tracks
 
 
-def is_chinese_text(text: str) -> bool:
-    """Check if text contains Chinese characters."""
-    return bool(re.search(r"[\u4e00-\u9fff]", text))
-
-
-def is_english_text(text: str) -> bool:
-    """Check if text contains only English characters."""
-    return bool(re.match(r"^[a-zA-Z\s\-\.]+$", text))
+def _line_array(line) -> np.ndarray:
+    """
+    Convert a line's coordinates to an (n, 2) float array of x, y values.
+    An empty line gives an empty (0, 2) array; extra values such as z are
+    dropped, matching the x, y only output of the rounding.
+    """
+    arr = np.asarray(line, dtype=np.float64)
+    if arr.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] < 2:
+        raise ValueError(f"Expected a list of [x, y] positions, got shape {arr.shape}")
+    return arr[:, :2]
 
 
 def round_coordinates(geometry: Dict[str, Any], precision: int = 4) -> Dict[str, Any]:
     """
-    Round coordinates in geometry to specified decimal places.
+    Round coordinates in geometry to specified decimal places, with the same
+    results as Python's round()
     """
     if geometry.get("type") == "LineString":
         coords = geometry.get("coordinates", [])
-        rounded_coords = [
-            [round(coord[0], precision), round(coord[1], precision)] for coord in coords
-        ]
+        arr = _line_array(coords)
+        rounded_coords = round_coordinate_array(arr, precision).tolist()
         return {"type": "LineString", "coordinates": rounded_coords}
     elif geometry.get("type") == "MultiLineString":
         coords = geometry.get("coordinates", [])
-        rounded_coords = [
-            [[round(coord[0], precision), round(coord[1], precision)] for coord in line]
-            for line in coords
-        ]
+        if not coords:
+            return {"type": "MultiLineString", "coordinates": []}
+
+        # Round all lines together, then split them back apart
+        lines = [_line_array(line) for line in coords]
+        rounded = round_coordinate_array(np.concatenate(lines), precision)
+        split_points = np.cumsum([len(line) for line in lines])[:-1]
+        rounded_coords = [line.tolist() for line in np.split(rounded, split_points)]
         return {"type": "MultiLineString", "coordinates": rounded_coords}
     else:
         return geometry
 
 
-def should_keep_name_field(field_name: str, field_value: str) -> bool:
-    """
-    Determine if a name field should be kept based on language.
-    Keep fields that are:
-    - Generic 'name' field
-    - English names (name:en)
-    - Chinese names (name:zh, name:zh-Hans, name:zh-Hant)
-    """
-    if field_name == "name":
-        return True
-
-    if field_name.startswith("name:"):
-        lang = field_name.split(":", 1)[1]
-        if lang in KEEP_LANGUAGES:
-            return True
-
-    return False
+# Note: Usage filtering is already done in the simple downsampled file
 
 
-# Note: Usage filtering is already done in the simple downsampled file
+def get_dropped_fields(field_coverage: Dict[str, float]) -> FrozenSet[str]:
+    """
+    Get the set of fields to drop: excluded fields plus fields with less
+    than 20% coverage.
+    """
+    low_coverage_fields = {f for f, c in field_coverage.items() if c < 0.20}
+    return frozenset(EXCLUDED_FIELDS | low_coverage_fields)
 
 
 def filter_properties(
-    properties: Dict[str, Any], field_coverage: Dict[str, float]
+    properties: Dict[str, Any], dropped_fields: FrozenSet[str]
 ) -> Dict[str, Any]:
     """
     Filter properties dictionary to remove unwanted fields.
+    Name fields are only kept for the generic name and the languages in
+    KEEP_LANGUAGES.
     Note: Usage filtering is already done in the simple downsampled file.
     """
-    filtered_props = {}
-
-    # Filter out excluded fields
-    for key, value in properties.items():
-        if key in EXCLUDED_FIELDS:
-            continue
+    return {
+        key: value
+        for key, value in properties.items()
+        if key not in dropped_fields
+        and (key in KEEP_NAME_FIELDS or not key.startswith("name"))
+    }
 
-        # Skip fields with less than 20% coverage
-        if key in field_coverage and field_coverage[key] < 0.20:
-            continue
 
-        # Handle name fields specially
-        if key.startswith("name"):
-            if should_keep_name_field(key, str(value)):
-                filtered_props[key] = value
-        else:
-            filtered_props[key] = value
-
-    return filtered_props
-
-
-def calculate_field_coverage(input_file: str) -> Dict[str, float]:
+def calculate_field_coverage(
+    input_file: str, spool: Optional[BinaryIO] = None
+) -> Tuple[Dict[str, float], int]:
     """
     Calculate field coverage from the simple downsampled file to determine which fields to keep.
+    If a spool file is given, each feature is also written to it as one JSON
+    line so the next pass can read it back without re-parsing the GeoJSON.
+    Returns the field coverage and the number of features read.
     """
     print("Calculating field coverage from simple downsampled file...")
 
@@ -147,19 +145,10 @@ def calculate_field_coverage(input_file: str) -> Dict[str, float]:
 
     print(f"  Processing file: {os.path.basename(input_file)}")
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    features = data.get("features", [])
-    total_features = len(features)
+    print("    Analyzing features...")
 
-    print(f"    Analyzing {total_features:,} features...")
-
-    for i, feature in enumerate(features):
-        # Progress tracking for large files
-        if i % 5000 == 0 or i == total_features - 1:
-            progress = ((i + 1) / total_features) * 100
-            print(f"      Progress: {progress:.1f}% ({i+1:,}/{total_features:,})")
+    for feature in tqdm(iter_features(input_file), unit=" features"):
+        total_features += 1
 
         properties = feature.get("properties", {})
 
@@ -167,6 +156,9 @@ def calculate_field_coverage(input_file: str) -> Dict[str, float]:
         for key in properties.keys():
             field_counts[key] = field_counts.get(key, 0) + 1
 
+        if spool is not None:
+            spool.write(orjson.dumps(feature, option=orjson.OPT_APPEND_NEWLINE))
+
     # Calculate coverage percentages
     field_coverage = {}
     for field, count in field_counts.items():
@@ -183,47 +175,34 @@ def calculate_field_coverage(input_file: str) -> Dict[str, float]:
         f"{sorted(low_coverage_fields)}"
     )
 
-    return field_coverage
+    return field_coverage, total_features
 
 
-def process_geojson_file(
-    file_path: str, field_coverage: Dict[str, float]
-) -> List[Dict[str, Any]]:
+def process_features(
+    features: Iterable[Dict[str, Any]],
+    field_coverage: Dict[str, float],
+    total_features: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
     """
-    Process the simple downsampled GeoJSON file and return filtered features.
-    Note: Coordinate rounding is now done as the final step.
+    Process the features of the simple downsampled file and yield filtered
+    features with rounded coordinates. The optional feature total is only
+    used for the progress bar.
     """
-    print(f"Processing {file_path}...")
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    features = data.get("features", [])
-    total_features = len(features)
-    filtered_features = []
-
-    print(f"  Applying advanced filtering to {total_features:,} features...")
+    dropped_fields = get_dropped_fields(field_coverage)
 
-    for i, feature in enumerate(features):
-        # Progress tracking for large files
-        if i % 1000 == 0 or i == total_features - 1:
-            progress = ((i + 1) / total_features) * 100
-            print(f"    Progress: {progress:.1f}% ({i+1:,}/{total_features:,})")
+    print("  Applying advanced filtering and coordinate rounding to features...")
 
+    for feature in tqdm(features, total=total_features, unit=" features"):
         properties = feature.get("properties", {})
 
         # Filter properties (field filtering) - usage filtering already done
-        filtered_props = filter_properties(properties, field_coverage)
+        filtered_props = filter_properties(properties, dropped_fields)
 
-        filtered_feature = {
+        yield {
             "type": "Feature",
-            "geometry": feature.get("geometry"),  # Keep original coordinates
+            "geometry": round_coordinates(feature.get("geometry")),
             "properties": filtered_props,
         }
-        filtered_features.append(filtered_feature)
-
-    print(f"  Processed {len(filtered_features):,} features")
-    return filtered_features
 
 
 def apply_advanced_processing():
@@ -253,42 +232,34 @@ def apply_advanced_processing():
 
     print(f"Found input file: {INPUT_FILE}")
 
-    # Calculate field coverage first
-    print("\nStep 1/4: Calculating field coverage...")
-    field_coverage = calculate_field_coverage(input_path)
-
-    # Process the file
-    print(f"\nStep 2/4: Processing file...")
-    all_features = process_geojson_file(input_path, field_coverage)
-
-    # Count original features for statistics
-    with open(input_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    total_original_features = len(data.get("features", []))
-
-    # Round coordinates as final step
-    print("\nStep 3/4: Rounding coordinates...")
-    print(f"Rounding coordinates for {len(all_features):,} features...")
-
-    for i, feature in enumerate(all_features):
-        if i % 1000 == 0 or i == len(all_features) - 1:
-            progress = ((i + 1) / len(all_features)) * 100
-            print(f"  Progress: {progress:.1f}% ({i+1:,}/{len(all_features):,})")
-
-        # Round coordinates
-        feature["geometry"] = round_coordinates(feature.get("geometry"))
-
-    print("✓ Coordinates rounded successfully!")
+    output_path = os.path.join(COUNTRY_DIR, OUTPUT_FILE)
 
-    # Create output GeoJSON
-    print("\nStep 4/4: Creating output file...")
-    output_data = {"type": "FeatureCollection", "features": all_features}
+    # Features are spooled as JSON lines during the coverage pass, so the
+    # processing pass does not have to parse the GeoJSON file again
+    with tempfile.TemporaryFile() as spool:
+        # Calculate field coverage first
+        print("\nStep 1/2: Calculating field coverage...")
+        field_coverage, total_original_features = calculate_field_coverage(
+            input_path, spool
+        )
 
-    # Write output file
-    output_path = os.path.join(COUNTRY_DIR, OUTPUT_FILE)
-    print(f"Writing output to: {output_path}")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, separators=(",", ":"))
+        # Process the spooled features, writing each one to the output as
+        # soon as it is filtered
+        print(
+            "\nStep 2/2: Filtering fields, rounding coordinates and writing output..."
+        )
+        print(f"Writing output to: {output_path}")
+        spool.seek(0)
+        sample_features = []
+        with FeatureCollectionWriter(output_path) as writer:
+            for feature in process_features(
+                (orjson.loads(line) for line in spool),
+                field_coverage,
+                total_original_features,
+            ):
+                writer.write(feature)
+                if len(sample_features) < 3:
+                    sample_features.append(feature)
 
     print("✓ Output file created successfully!")
 
@@ -297,7 +268,7 @@ def apply_advanced_processing():
     print("ADVANCED PROCESSING STATISTICS")
     print("=" * 60)
     print(f"Input features (from simple): {total_original_features:,}")
-    print(f"Output features (after advanced processing): {len(all_features):,}")
+    print(f"Output features (after advanced processing): {writer.count:,}")
     print("No features removed - only field filtering and coordinate rounding applied")
 
     # Show filtering criteria
@@ -321,7 +292,7 @@ def apply_advanced_processing():
 
     # Print some examples of filtered features
     print("\nSample of processed features:")
-    for i, feature in enumerate(all_features[:3]):
+    for i, feature in enumerate(sample_features):
         props = feature.get("properties", {})
         railway_type = props.get("railway", "unknown")
         usage_type = props.get("usage", "unknown")
@@ -4,9 +4,16 @@ Filter railway nodes to keep only main railway stations.
 Excludes tram, subway, stops, halts, and other non-main railway infrastructure.
 """
 
-import json
+import orjson
 import sys
 from pathlib import Path
+from tqdm import tqdm
+
+# Property keys that mark tram, subway, or light rail infrastructure
+TRAM_SUBWAY_KEYS = frozenset({'tram', 'subway', 'light_rail'})
+
+# Public transport types that are not main railway stations
+EXCLUDED_PUBLIC_TRANSPORT = frozenset({'tram_stop', 'subway_station'})
 
 def is_main_railway_station_only(feature):
     """
@@ -15,27 +22,13 @@ def is_main_railway_station_only(feature):
     """
     props = feature.get('properties', {})
     
-    # Get railway type
-    railway_type = props.get('railway', '')
-    
-    # Check for tram or subway indicators
-    if any(indicator in props for indicator in ['tram', 'subway', 'light_rail']):
-        return False
-    
-    # Check if it's explicitly marked as tram or subway
-    if railway_type in ['tram_stop', 'tram_level_crossing', 'tram_crossing']:
-        return False
-    
-    # Check public transport type
-    public_transport = props.get('public_transport', '')
-    if public_transport in ['tram_stop', 'subway_station']:
-        return False
-    
-    # Only keep main railway stations (exclude stops and halts)
-    if railway_type == 'station':
-        return True
-    
-    return False
+    # Only keep main railway stations (exclude stops, halts, and tram
+    # railway types), checked first since it rejects most nodes
+    return (
+        props.get('railway') == 'station'
+        and TRAM_SUBWAY_KEYS.isdisjoint(props)
+        and props.get('public_transport') not in EXCLUDED_PUBLIC_TRANSPORT
+    )
 
 def filter_railway_nodes(input_file, output_file):
     """
@@ -43,8 +36,8 @@ def filter_railway_nodes(input_file, output_file):
     """
     print(f"Reading {input_file}...")
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with open(input_file, 'rb') as f:
+        data = orjson.loads(f.read())
     
     print(f"Original features: {len(data['features'])}")
     
@@ -52,7 +45,7 @@ def filter_railway_nodes(input_file, output_file):
     filtered_features = []
     excluded_count = 0
     
-    for feature in data['features']:
+    for feature in tqdm(data['features'], desc='Filtering', unit=' features'):
         if is_main_railway_station_only(feature):
             filtered_features.append(feature)
         else:
@@ -69,8 +62,8 @@ def filter_railway_nodes(input_file, output_file):
     
     # Write filtered data
     print(f"Writing filtered data to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(filtered_data, f, ensure_ascii=False, separators=(',', ':'))
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(filtered_data))
     
     print("Filtering complete!")
     
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 """
 Convert OSM PBF to GeoJSON - Railway features only, with progress tracking
-Requires: pip install osmium-tool geojson
+Requires: pip install osmium orjson
 """
 
+import os
 import osmium
-import geojson
-import json
+import re
 import time
 from collections import defaultdict
 from config import (
@@ -16,32 +16,48 @@ from config import (
     validate_configuration,
     print_configuration,
 )
+from geojson_io import FeatureCollectionWriter
+
+# Tag keys that always mark a railway feature
+RAILWAY_KEYS = frozenset({"railway", "railroad", "train"})
+
+# Keys or values mentioning railway/railroad anywhere, or exactly "train"
+RAILWAY_PATTERN = re.compile(r"rail(?:way|road)|^train\Z", re.IGNORECASE)
+
+# Decimal places kept for node coordinates, the precision geojson.Point used
+COORDINATE_PRECISION = 6
 
 
 class RailwayConverter(osmium.SimpleHandler):
-    """Convert OSM railway features to GeoJSON with progress tracking"""
+    """
+    Convert OSM railway features to GeoJSON with progress tracking.
+    Features are written to the given FeatureCollectionWriter as they are
+    found instead of being kept in memory.
+    """
 
-    def __init__(self, progress_interval=50000):
+    def __init__(self, writer, progress_interval=50000):
         osmium.SimpleHandler.__init__(self)
+        self.writer = writer
         self.progress_interval = progress_interval
 
         # Progress tracking
         self.processed_count = 0
+        self._next_report = progress_interval
         self.railway_nodes_count = 0
         self.railway_ways_count = 0
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
 
-        # Store railway features
-        self.railway_features = []
-        self.node_cache = {}  # Cache node locations for way processing
+        # Properties of the first railway features, for the summary
+        self.sample_properties = []
 
         print("Starting railway conversion...")
         print(f"Progress will be reported every {progress_interval:,} features")
         print("=" * 60)
 
     def _print_progress(self, feature_type=""):
-        """Print processing progress"""
-        elapsed = time.time() - self.start_time
+        """Print processing progress and schedule the next report"""
+        self._next_report += self.progress_interval
+        elapsed = time.monotonic() - self.start_time
         rate = self.processed_count / elapsed if elapsed > 0 else 0
 
         print(
@@ -56,26 +72,20 @@ class RailwayConverter(osmium.SimpleHandler):
     def _is_railway(self, tags):
         """Check if feature has railway-related tags"""
         for tag in tags:
-            key = tag.k.lower()
-            value = tag.v.lower()
+            key = tag.k
+            value = tag.v
 
             # Main railway tags
-            if key == "railway":
+            if key in RAILWAY_KEYS:
                 return True
 
-            # Public transport stations
-            if key == "public_transport" and "station" in value:
+            # Public transport stations, compared case-insensitively like the
+            # pattern below
+            if key.lower() == "public_transport" and "station" in value.lower():
                 return True
 
             # Additional railway-related tags
-            if (
-                "railway" in key
-                or "railway" in value
-                or "railroad" in key
-                or "railroad" in value
-                or key == "train"
-                or value == "train"
-            ):
+            if RAILWAY_PATTERN.search(key) or RAILWAY_PATTERN.search(value):
                 return True
 
         return False
@@ -94,25 +104,31 @@ class RailwayConverter(osmium.SimpleHandler):
         """Process OSM nodes"""
         self.processed_count += 1
 
-        if self.processed_count % self.progress_interval == 0:
+        if self.processed_count == self._next_report:
             self._print_progress("nodes")
 
-        # Always cache node location for way processing
-        if n.location.valid():
-            self.node_cache[n.id] = [n.location.lon, n.location.lat]
-
         # Only create features for railway nodes with tags
         if len(n.tags) > 0 and self._is_railway(n.tags) and n.location.valid():
             self.railway_nodes_count += 1
 
             properties = self._create_feature_properties(n.id, "node", n.tags)
 
-            feature = geojson.Feature(
-                geometry=geojson.Point([n.location.lon, n.location.lat]),
-                properties=properties,
+            self.writer.write(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [
+                            round(n.location.lon, COORDINATE_PRECISION),
+                            round(n.location.lat, COORDINATE_PRECISION),
+                        ],
+                    },
+                    "properties": properties,
+                }
             )
 
-            self.railway_features.append(feature)
+            if len(self.sample_properties) < 1000:
+                self.sample_properties.append(properties)
 
 
 def convert_railways_to_geojson(input_pbf, output_geojson, progress_interval=50000):
@@ -129,35 +145,33 @@ def convert_railways_to_geojson(input_pbf, output_geojson, progress_interval=500
     print("-" * 60)
 
     try:
-        # Create converter and process file
-        converter = RailwayConverter(progress_interval)
-        converter.apply_file(input_pbf)
+        # Check the input before the output file is created
+        if not os.path.exists(input_pbf):
+            raise FileNotFoundError(input_pbf)
+
+        # Create converter and process file, writing features as they are found.
+        # The output is a machine-read intermediate, so it is written compact.
+        with FeatureCollectionWriter(output_geojson) as writer:
+            converter = RailwayConverter(writer, progress_interval)
+            # Untagged nodes are dropped in C++ before reaching the Python
+            # callback; osmium already decodes PBF blocks on its own thread pool
+            converter.apply_file(input_pbf, filters=[osmium.filter.EmptyTagFilter()])
 
         # Print final statistics
-        elapsed = time.time() - converter.start_time
-        total_railway_features = len(converter.railway_features)
+        elapsed = time.monotonic() - converter.start_time
+        total_railway_features = writer.count
 
         print("\n" + "=" * 60)
         print("CONVERSION COMPLETE!")
         print("=" * 60)
         print(f"Processing time: {elapsed:.1f} seconds")
-        print(f"Total features processed: {converter.processed_count:,}")
+        print(f"Tagged features processed: {converter.processed_count:,}")
         print(f"Railway nodes found: {converter.railway_nodes_count:,}")
         print(f"Railway ways found: {converter.railway_ways_count:,}")
         print(f"Total railway features in GeoJSON: {total_railway_features:,}")
         print(f"Processing rate: {converter.processed_count/elapsed:.0f} features/sec")
-        print(f"Cached nodes: {len(converter.node_cache):,}")
 
         if total_railway_features > 0:
-            # Create GeoJSON FeatureCollection
-            print(f"\nCreating GeoJSON FeatureCollection...")
-            feature_collection = geojson.FeatureCollection(converter.railway_features)
-
-            # Write to file
-            print(f"Writing to {output_geojson}...")
-            with open(output_geojson, "w", encoding="utf-8") as f:
-                geojson.dump(feature_collection, f, indent=2, ensure_ascii=False)
-
             print(
                 f"✓ Successfully saved {total_railway_features:,} railway features to {output_geojson}"
             )
@@ -167,11 +181,11 @@ def convert_railways_to_geojson(input_pbf, output_geojson, progress_interval=500
             feature_types = defaultdict(int)
             railway_types = defaultdict(int)
 
-            for feature in converter.railway_features[:1000]:  # Sample first 1000
-                osm_type = feature["properties"].get("osm_type", "unknown")
+            for properties in converter.sample_properties:  # Sample first 1000
+                osm_type = properties.get("osm_type", "unknown")
                 feature_types[osm_type] += 1
 
-                railway_value = feature["properties"].get("railway", "other")
+                railway_value = properties.get("railway", "other")
                 railway_types[railway_value] += 1
 
             print("  OSM Types:")
@@ -1,46 +1,76 @@
 #!/usr/bin/env python3
 """
 Convert OSM PBF to GeoJSON - Railway features only, with progress tracking
-Requires: pip install osmium-tool geojson
+Requires: pip install osmium orjson numpy
 """
 
+import numpy as np
+import os
 import osmium
-import geojson
-import json
+import re
 import time
+from array import array
 from collections import defaultdict
 from config import (
     get_input_path,
     get_railways_ways_path,
+    get_railways_way_node_ids_path,
     PROGRESS_INTERVAL,
+    WAYS_WITH_LOCATIONS,
     validate_configuration,
     print_configuration,
 )
+from geojson_io import FeatureCollectionWriter
+
+# Tag keys that always mark a railway feature
+RAILWAY_KEYS = frozenset({"railway", "railroad", "train"})
+
+# Keys or values mentioning railway/railroad anywhere, or exactly "train"
+RAILWAY_PATTERN = re.compile(r"rail(?:way|road)|^train\Z", re.IGNORECASE)
 
 
 class SimpleRailwayExtractor(osmium.SimpleHandler):
-    """Extract railway ways without coordinates - just IDs and tags"""
+    """
+    Extract railway ways without coordinates - just IDs and tags.
+    With with_locations, the file must be applied with locations=True and
+    each way gets its geometry from the locations of its nodes.
+    Features are written to the given FeatureCollectionWriter as they are
+    found instead of being kept in memory.
+    """
 
-    def __init__(self, progress_interval=50000):
+    def __init__(self, writer, progress_interval=50000, with_locations=False):
         osmium.SimpleHandler.__init__(self)
+        self.writer = writer
         self.progress_interval = progress_interval
+        self.with_locations = with_locations
 
         # Progress tracking
         self.processed_count = 0
+        self._next_report = progress_interval
         self.railway_ways_count = 0
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
+
+        # First railway way features, for the summary
+        self.sample_features = []
 
-        # Store railway way data
-        self.railway_ways = []
+        # Node IDs referenced by railway ways, so module 4 does not have to
+        # re-read the ways to find which node locations it needs
+        self.way_node_ids = array("q")
 
         print("Starting simple railway ways extraction...")
-        print("(No coordinates - just way IDs, tags, and node lists)")
+        if with_locations:
+            print(
+                "(Coordinates from node locations, plus way IDs, tags, and node lists)"
+            )
+        else:
+            print("(No coordinates - just way IDs, tags, and node lists)")
         print(f"Progress will be reported every {progress_interval:,} features")
         print("=" * 60)
 
     def _print_progress(self, feature_type=""):
-        """Print processing progress"""
-        elapsed = time.time() - self.start_time
+        """Print processing progress and schedule the next report"""
+        self._next_report += self.progress_interval
+        elapsed = time.monotonic() - self.start_time
         rate = self.processed_count / elapsed if elapsed > 0 else 0
 
         print(
@@ -54,26 +84,20 @@ class SimpleRailwayExtractor(osmium.SimpleHandler):
     def _is_railway(self, tags):
         """Check if feature has railway-related tags"""
         for tag in tags:
-            key = tag.k.lower()
-            value = tag.v.lower()
+            key = tag.k
+            value = tag.v
 
             # Main railway tags
-            if key == "railway":
+            if key in RAILWAY_KEYS:
                 return True
 
-            # Public transport stations
-            if key == "public_transport" and "station" in value:
+            # Public transport stations, compared case-insensitively like the
+            # pattern below
+            if key.lower() == "public_transport" and "station" in value.lower():
                 return True
 
             # Additional railway-related tags
-            if (
-                "railway" in key
-                or "railway" in value
-                or "railroad" in key
-                or "railroad" in value
-                or key == "train"
-                or value == "train"
-            ):
+            if RAILWAY_PATTERN.search(key) or RAILWAY_PATTERN.search(value):
                 return True
 
         return False
@@ -89,7 +113,7 @@ class SimpleRailwayExtractor(osmium.SimpleHandler):
         """Extract railway ways with tags and node IDs only"""
         self.processed_count += 1
 
-        if self.processed_count % self.progress_interval == 0:
+        if self.processed_count == self._next_report:
             self._print_progress("ways")
 
         # Only process railway ways
@@ -101,9 +125,8 @@ class SimpleRailwayExtractor(osmium.SimpleHandler):
                 "osm_id": w.id,
                 "osm_type": "way",
                 "node_count": len(w.nodes),
-                "node_ids": [
-                    int(node.ref) for node in w.nodes
-                ],  # Convert NodeRef to int
+                # NodeRef.ref is already a plain int
+                "node_ids": [node.ref for node in w.nodes],
             }
 
             # Add all OSM tags
@@ -112,27 +135,70 @@ class SimpleRailwayExtractor(osmium.SimpleHandler):
 
             # Create a "fake" point geometry at (0,0) since GeoJSON requires geometry
             # You can ignore the coordinates - the real data is in the properties
-            feature = geojson.Feature(
-                geometry=geojson.Point([0, 0]),  # Placeholder geometry
-                properties=properties,
-            )
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [0, 0]},  # Placeholder
+                "properties": properties,
+            }
+
+            if self.with_locations:
+                self._assign_coordinates(feature, w.nodes)
+            else:
+                self.way_node_ids.extend(properties["node_ids"])
 
-            self.railway_ways.append(feature)
+            self.writer.write(feature)
+            if len(self.sample_features) < 1000:
+                self.sample_features.append(feature)
 
             # Show first few ways
             if self.railway_ways_count <= 3:
                 railway_type = properties.get("railway", "unknown")
                 print(f"    ✓ Way {w.id}: {railway_type}, {len(w.nodes)} nodes")
 
+    def save_way_node_ids(self, filepath):
+        """
+        Save the unique node IDs referenced by railway ways as a sorted
+        int64 numpy array.
+
+        Args:
+            filepath (str): Path to the output .npy file
+        """
+        np.save(filepath, np.unique(np.frombuffer(self.way_node_ids, dtype=np.int64)))
+
+    def _assign_coordinates(self, feature, nodes):
+        """
+        Set the geometry of a way feature from its node locations, matching
+        the geometry module 4 would assign. Nodes without a valid location
+        are skipped, and the placeholder is kept if none are valid.
+        """
+        way_coordinates = [
+            [node.location.lon, node.location.lat]
+            for node in nodes
+            if node.location.valid()
+        ]
+
+        if len(way_coordinates) == 1:
+            # Single point
+            feature["geometry"] = {"type": "Point", "coordinates": way_coordinates[0]}
+        elif len(way_coordinates) > 1:
+            # Multiple points - create LineString
+            feature["geometry"] = {"type": "LineString", "coordinates": way_coordinates}
+
     def relation(self, r):
         """Skip relations"""
         self.processed_count += 1
 
-        if self.processed_count % self.progress_interval == 0:
+        if self.processed_count == self._next_report:
             self._print_progress("relations")
 
 
-def extract_railway_ways(input_pbf, output_geojson, progress_interval=50000):
+def extract_railway_ways(
+    input_pbf,
+    output_geojson,
+    progress_interval=50000,
+    with_locations=False,
+    node_ids_file=None,
+):
     """
     Extract railway ways from OSM PBF - no coordinates, just way data
 
@@ -140,39 +206,55 @@ def extract_railway_ways(input_pbf, output_geojson, progress_interval=50000):
         input_pbf: Path to input .osm.pbf file
         output_geojson: Path to output .geojson file
         progress_interval: How often to print progress
+        with_locations: Also assign coordinates from node locations in the
+            same pass, so module 4 is not needed
+        node_ids_file: Optional path to save the node IDs referenced by the
+            ways to, for module 4 (ignored with with_locations)
     """
     print(f"Extracting railway ways from {input_pbf}")
     print(f"Output will be saved to: {output_geojson}")
     print("-" * 60)
 
     try:
-        # Create extractor and process file
-        extractor = SimpleRailwayExtractor(progress_interval)
-        extractor.apply_file(input_pbf)
+        # Check the input before the output file is created
+        if not os.path.exists(input_pbf):
+            raise FileNotFoundError(input_pbf)
+
+        # Create extractor and process file, writing ways as they are found
+        with FeatureCollectionWriter(output_geojson, indent=True) as writer:
+            extractor = SimpleRailwayExtractor(
+                writer, progress_interval, with_locations
+            )
+            # Untagged objects are dropped in C++ before reaching the Python
+            # callbacks; osmium already decodes PBF blocks on its own thread pool
+            filters = [osmium.filter.EmptyTagFilter()]
+            if with_locations:
+                # Index node locations in memory so ways arrive with
+                # coordinates. The location index sees every node before the
+                # filters run.
+                extractor.apply_file(
+                    input_pbf, locations=True, idx="flex_mem", filters=filters
+                )
+            else:
+                extractor.apply_file(input_pbf, filters=filters)
+
+        if node_ids_file and not with_locations:
+            extractor.save_way_node_ids(node_ids_file)
 
         # Print final statistics
-        elapsed = time.time() - extractor.start_time
-        total_features = len(extractor.railway_ways)
+        elapsed = time.monotonic() - extractor.start_time
+        total_features = writer.count
 
         print("\n" + "=" * 60)
         print("EXTRACTION COMPLETE!")
         print("=" * 60)
         print(f"Processing time: {elapsed:.1f} seconds")
-        print(f"Total features processed: {extractor.processed_count:,}")
+        print(f"Tagged features processed: {extractor.processed_count:,}")
         print(f"Railway ways found: {extractor.railway_ways_count:,}")
         print(f"Railway ways saved: {total_features:,}")
         print(f"Processing rate: {extractor.processed_count/elapsed:.0f} features/sec")
 
         if total_features > 0:
-            # Create GeoJSON FeatureCollection
-            print(f"\nCreating GeoJSON FeatureCollection...")
-            feature_collection = geojson.FeatureCollection(extractor.railway_ways)
-
-            # Write to file
-            print(f"Writing to {output_geojson}...")
-            with open(output_geojson, "w", encoding="utf-8") as f:
-                geojson.dump(feature_collection, f, indent=2, ensure_ascii=False)
-
             print(
                 f"✅ Successfully saved {total_features:,} railway ways to {output_geojson}"
             )
@@ -181,7 +263,7 @@ def extract_railway_ways(input_pbf, output_geojson, progress_interval=50000):
             print(f"\nSample railway types found:")
             railway_types = defaultdict(int)
 
-            for feature in extractor.railway_ways[:1000]:  # Sample first 1000
+            for feature in extractor.sample_features:  # Sample first 1000
                 railway_value = feature["properties"].get("railway", "other")
                 railway_types[railway_value] += 1
 
@@ -191,9 +273,9 @@ def extract_railway_ways(input_pbf, output_geojson, progress_interval=50000):
                 print(f"  {rail_type}: {count:,}")
 
             # Show structure of first feature
-            if extractor.railway_ways:
+            if extractor.sample_features:
                 print(f"\nSample feature structure:")
-                sample = extractor.railway_ways[0]["properties"]
+                sample = extractor.sample_features[0]["properties"]
                 print(f"  OSM ID: {sample['osm_id']}")
                 print(f"  Railway type: {sample.get('railway', 'N/A')}")
                 print(f"  Node count: {sample['node_count']}")
@@ -235,13 +317,22 @@ def debug_run():
     print("=" * 60)
 
     try:
-        extractor = extract_railway_ways(input_path, output_path, PROGRESS_INTERVAL)
+        extractor = extract_railway_ways(
+            input_path,
+            output_path,
+            PROGRESS_INTERVAL,
+            WAYS_WITH_LOCATIONS,
+            get_railways_way_node_ids_path(),
+        )
 
-        if extractor and extractor.railway_ways:
+        if extractor and extractor.railway_ways_count:
             print(f"\n🚂 Railway extraction completed successfully!")
             print(f"   Output: {output_path}")
             print(f"   Contains: Way IDs, tags, and node ID lists")
-            print(f"   Note: No coordinates included - geometry is placeholder")
+            if WAYS_WITH_LOCATIONS:
+                print(f"   Note: Coordinates assigned - module 4 can be skipped")
+            else:
+                print(f"   Note: No coordinates included - geometry is placeholder")
 
     except FileNotFoundError:
         print(f"ERROR: File not found: {input_path}")
@@ -269,10 +360,30 @@ def main():
         default=50000,
         help="Progress interval (default: 50000)",
     )
+    parser.add_argument(
+        "--locations",
+        action="store_true",
+        help="Assign coordinates from node locations in the same pass",
+    )
+    parser.add_argument(
+        "--node-ids",
+        help="Output .npy file for the way node IDs used by module 4 "
+        "(default: railways_way_node_ids.npy next to the output file)",
+    )
 
     args = parser.parse_args()
 
-    extract_railway_ways(args.input, args.output, args.progress)
+    # Keep the node IDs with the ways they came from, so a run on another
+    # extract never replaces the file module 4 reads for the configured one
+    if args.node_ids is None:
+        args.node_ids = os.path.join(
+            os.path.dirname(os.path.abspath(args.output)),
+            os.path.basename(get_railways_way_node_ids_path()),
+        )
+
+    extract_railway_ways(
+        args.input, args.output, args.progress, args.locations, args.node_ids
+    )
 
 
 # =============================================================================
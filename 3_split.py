@@ -1,9 +1,11 @@
-import json
 import math
+import orjson
 from config import (
     get_railways_ways_path,
     get_railways_ways_split_paths,
+    get_railways_ways_updated_paths,
     NUM_SPLITS,
+    WAYS_WITH_LOCATIONS,
     validate_configuration,
     print_configuration,
 )
@@ -21,8 +23,8 @@ def split_geojson(input_file, num_files=6, output_files=None):
 
     # Read the original GeoJSON file
     print(f"Reading {input_file}...")
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(input_file, "rb") as f:
+        data = orjson.loads(f.read())
 
     features = data["features"]
     total_features = len(features)
@@ -57,8 +59,8 @@ def split_geojson(input_file, num_files=6, output_files=None):
         }
 
         # Write the file
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, separators=(",", ":"))
+        with open(output_file, "wb") as f:
+            f.write(orjson.dumps(output_data))
 
         actual_features = len(output_data["features"])
         print(f"Created {output_file} with {actual_features} features")
@@ -77,7 +79,11 @@ def main():
         return
 
     input_file = get_railways_ways_path()
-    output_files = get_railways_ways_split_paths()
+    if WAYS_WITH_LOCATIONS:
+        # Ways already have coordinates, so write the updated files directly
+        output_files = get_railways_ways_updated_paths()
+    else:
+        output_files = get_railways_ways_split_paths()
 
     print(f"Input file: {input_file}")
     print(f"Number of splits: {NUM_SPLITS}")
@@ -1,12 +1,28 @@
-import json
+import multiprocessing
+import numpy as np
+import os
 import osmium
+from array import array
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 from config import (
     get_input_path,
+    get_railways_ways_path,
+    get_railways_way_node_ids_path,
     get_railways_ways_split_paths,
     get_railways_ways_updated_paths,
+    WAYS_WITH_LOCATIONS,
     validate_configuration,
     print_configuration,
 )
+from geojson_io import FeatureCollectionWriter, batched, iter_features
+
+# Node coordinate lookup shared with forked worker processes, which inherit it
+# copy-on-write instead of receiving a pickled copy per task
+_shared_node_coords = None
+
+# Number of ways whose node IDs are looked up together in one batch
+WAY_BATCH_SIZE = 10000
 
 
 class NodeCoordinateExtractor(osmium.SimpleHandler):
@@ -15,15 +31,104 @@ class NodeCoordinateExtractor(osmium.SimpleHandler):
     def __init__(self, required_node_ids):
         osmium.SimpleHandler.__init__(self)
         self.required_node_ids = required_node_ids
-        self.node_coords = {}
+        self.node_ids = array("q")
+        self.lons = array("d")
+        self.lats = array("d")
         self.found_count = 0
 
     def node(self, n):
         """Process OSM nodes and extract coordinates for required IDs"""
         if n.id in self.required_node_ids and n.location.valid():
-            self.node_coords[n.id] = [n.location.lon, n.location.lat]
+            self.node_ids.append(n.id)
+            self.lons.append(n.location.lon)
+            self.lats.append(n.location.lat)
             self.found_count += 1
 
+    def node_coordinates(self):
+        """
+        Get the extracted coordinates as a sorted lookup table.
+
+        Returns:
+            tuple: Sorted int64 array of node IDs and a float64 (n, 2) array
+                of their [lon, lat] coordinates
+        """
+        ids = np.frombuffer(self.node_ids, dtype=np.int64)
+        coords = np.column_stack(
+            (
+                np.frombuffer(self.lons, dtype=np.float64),
+                np.frombuffer(self.lats, dtype=np.float64),
+            )
+        )
+        order = np.argsort(ids, kind="stable")
+        return ids[order], coords[order]
+
+
+def lookup_node_coordinates(node_coords, node_ids):
+    """
+    Look up node coordinates in the sorted lookup table.
+
+    Args:
+        node_coords (tuple): Sorted node IDs and matching coordinates
+        node_ids (np.ndarray): int64 array of node IDs to look up
+
+    Returns:
+        tuple: List of [lon, lat] coordinates for the nodes that were found,
+            in order, and a boolean array marking which node IDs were found
+    """
+    ids, coords = node_coords
+    if len(ids) == 0:
+        return [], np.zeros(len(node_ids), dtype=bool)
+
+    # Binary search each node ID; positions past the end are clipped so the
+    # equality check marks them as missing
+    positions = np.searchsorted(ids, node_ids)
+    np.minimum(positions, len(ids) - 1, out=positions)
+    found = ids[positions] == node_ids
+
+    return coords[positions[found]].tolist(), found
+
+
+def assign_batch_coordinates(ways, node_coords, missing_nodes):
+    """
+    Assign coordinates to a batch of ways with a single lookup covering the
+    node IDs of every way in the batch.
+
+    Args:
+        ways (list): GeoJSON features with non-empty node_ids, updated in place
+        node_coords (tuple): Sorted node IDs and matching coordinates
+        missing_nodes (set): Set that node IDs not found are added to
+    """
+    lengths = [len(way["properties"]["node_ids"]) for way in ways]
+    node_ids = np.fromiter(
+        chain.from_iterable(way["properties"]["node_ids"] for way in ways),
+        dtype=np.int64,
+        count=sum(lengths),
+    )
+
+    found_coords, found = lookup_node_coordinates(node_coords, node_ids)
+    missing_nodes.update(node_ids[~found].tolist())
+
+    # Number of found nodes per way, used to slice the flat coordinate list
+    starts = np.cumsum([0] + lengths[:-1])
+    found_counts = np.add.reduceat(found, starts, dtype=np.int64).tolist()
+
+    end = 0
+    for way, found_count in zip(ways, found_counts):
+        start, end = end, end + found_count
+        if found_count == 1:
+            # Single point
+            way["geometry"] = {
+                "type": "Point",
+                "coordinates": found_coords[start],
+            }
+        elif found_count > 1:
+            # Multiple points - create LineString
+            way["geometry"] = {
+                "type": "LineString",
+                "coordinates": found_coords[start:end],
+            }
+        # No valid coordinates found, keep original
+
 
 def collect_all_node_ids(ways_files):
     """
@@ -41,10 +146,7 @@ def collect_all_node_ids(ways_files):
 
     for ways_file in ways_files:
         try:
-            with open(ways_file, "r", encoding="utf-8") as f:
-                ways_data = json.load(f)
-
-            for feature in ways_data["features"]:
+            for feature in iter_features(ways_file):
                 node_ids = feature["properties"].get("node_ids", [])
                 all_node_ids.update(node_ids)
 
@@ -57,6 +159,31 @@ def collect_all_node_ids(ways_files):
     return all_node_ids
 
 
+def load_required_node_ids(node_ids_file, ways_path, ways_files):
+    """
+    Load the node IDs referenced by railway ways from the file saved by
+    module 2, or collect them from the ways files if it is missing or older
+    than the ways file module 2 wrote alongside it.
+
+    Args:
+        node_ids_file (str): Path to the node IDs .npy file from module 2
+        ways_path (str): Path to the unsplit ways file from module 2
+        ways_files (list): List of ways file paths
+
+    Returns:
+        set: Set of unique node IDs referenced in ways files
+    """
+    try:
+        if os.path.getmtime(node_ids_file) >= os.path.getmtime(ways_path):
+            node_ids = set(np.load(node_ids_file).tolist())
+            print(f"Loaded {len(node_ids)} unique node IDs from {node_ids_file}")
+            return node_ids
+    except OSError:
+        pass
+
+    return collect_all_node_ids(ways_files)
+
+
 def load_specific_node_coordinates(pbf_file, required_node_ids):
     """
     Load coordinates for specific node IDs from OSM PBF file.
@@ -66,7 +193,8 @@ def load_specific_node_coordinates(pbf_file, required_node_ids):
         required_node_ids (set): Set of node IDs to load coordinates for
 
     Returns:
-        dict: Dictionary mapping node osm_id to coordinates
+        tuple: Sorted int64 array of node IDs and a float64 (n, 2) array of
+            their [lon, lat] coordinates
     """
     print(
         f"Loading coordinates for {len(required_node_ids)} specific nodes "
@@ -86,7 +214,7 @@ def load_specific_node_coordinates(pbf_file, required_node_ids):
         missing_count = len(required_node_ids) - extractor.found_count
         print(f"Warning: {missing_count} node IDs not found in PBF file")
 
-    return extractor.node_coords
+    return extractor.node_coordinates()
 
 
 def update_way_coordinates(ways_file, node_coords, output_file):
@@ -95,61 +223,88 @@ def update_way_coordinates(ways_file, node_coords, output_file):
 
     Args:
         ways_file (str): Path to input ways file
-        node_coords (dict): Dictionary mapping node IDs to coordinates
+        node_coords (tuple): Sorted node IDs and matching coordinates
         output_file (str): Path to output file
     """
     print(f"Processing {ways_file}...")
 
-    with open(ways_file, "r", encoding="utf-8") as f:
-        ways_data = json.load(f)
-
-    updated_features = []
     missing_nodes = set()
 
-    for feature in ways_data["features"]:
-        # Get the node IDs for this way
-        node_ids = feature["properties"].get("node_ids", [])
-
-        if not node_ids:
-            # If no node_ids, keep original coordinates
-            updated_features.append(feature)
-            continue
-
-        # Collect coordinates for all nodes in this way
-        way_coordinates = []
-        for node_id in node_ids:
-            if node_id in node_coords:
-                way_coordinates.append(node_coords[node_id])
-            else:
-                missing_nodes.add(node_id)
-
-        # Update the feature based on number of coordinates
-        if len(way_coordinates) == 0:
-            # No valid coordinates found, keep original
-            updated_features.append(feature)
-        elif len(way_coordinates) == 1:
-            # Single point
-            feature["geometry"] = {"type": "Point", "coordinates": way_coordinates[0]}
-            updated_features.append(feature)
-        else:
-            # Multiple points - create LineString
-            feature["geometry"] = {"type": "LineString", "coordinates": way_coordinates}
-            updated_features.append(feature)
-
-    # Create updated GeoJSON
-    updated_data = {"type": "FeatureCollection", "features": updated_features}
-
-    # Write updated file
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(updated_data, f, ensure_ascii=False, separators=(",", ":"))
-
-    print(f"Updated {len(updated_features)} features in {output_file}")
+    # Features are streamed from the input and written to the output one at
+    # a time, so neither file is held in memory. The input is opened first so
+    # a missing file does not leave an empty output behind.
+    features = iter_features(ways_file)
+    with FeatureCollectionWriter(output_file) as writer:
+        for batch in batched(features, WAY_BATCH_SIZE):
+            # Ways without node_ids keep their original coordinates
+            ways = [
+                feature for feature in batch if feature["properties"].get("node_ids")
+            ]
+            if ways:
+                assign_batch_coordinates(ways, node_coords, missing_nodes)
+
+            for feature in batch:
+                writer.write(feature)
+
+    print(f"Updated {writer.count} features in {output_file}")
     if missing_nodes:
         print(f"Warning: {len(missing_nodes)} node IDs not found in " f"nodes file")
 
     return len(missing_nodes)
 
 
+def _update_way_coordinates_safely(ways_file, node_coords, output_file):
+    """Run update_way_coordinates, reporting errors instead of raising."""
+    try:
+        return update_way_coordinates(ways_file, node_coords, output_file)
+    except FileNotFoundError:
+        print(f"Warning: {ways_file} not found, skipping...")
+    except Exception as e:
+        print(f"Error processing {ways_file}: {e}")
+    return 0
+
+
+def _update_shared_way_coordinates(ways_file, output_file):
+    """Update a ways file in a worker process using the inherited lookup."""
+    return _update_way_coordinates_safely(ways_file, _shared_node_coords, output_file)
+
+
+def update_all_way_coordinates(ways_files, node_coords, output_files):
+    """
+    Update coordinates in all ways files, one worker process per file where
+    the fork start method is available and sequentially otherwise.
+
+    Args:
+        ways_files (list): Paths to input ways files
+        node_coords (tuple): Sorted node IDs and matching coordinates
+        output_files (list): Paths to output files, matching ways_files
+
+    Returns:
+        int: Total number of missing node references across all files
+    """
+    global _shared_node_coords
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return sum(
+            _update_way_coordinates_safely(ways_file, node_coords, output_file)
+            for ways_file, output_file in zip(ways_files, output_files)
+        )
+
+    _shared_node_coords = node_coords
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(ways_files),
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            missing_counts = list(
+                executor.map(_update_shared_way_coordinates, ways_files, output_files)
+            )
+    finally:
+        _shared_node_coords = None
+
+    return sum(missing_counts)
+
+
 def main():
     """
     Main function to process all railway ways files using configuration.
@@ -160,6 +315,11 @@ def main():
     if not validate_configuration():
         return
 
+    if WAYS_WITH_LOCATIONS:
+        print("Coordinates were assigned by module 2 (WAYS_WITH_LOCATIONS)")
+        print("The split files are already the updated files - nothing to do")
+        return
+
     # Get file paths from configuration
     input_pbf = get_input_path()
     ways_files = get_railways_ways_split_paths()
@@ -170,25 +330,16 @@ def main():
     print(f"Output files: {updated_files}")
     print("=" * 60)
 
-    # Step 1: Collect all unique node IDs from ways files
-    required_node_ids = collect_all_node_ids(ways_files)
+    # Step 1: Collect all unique node IDs referenced by the ways
+    required_node_ids = load_required_node_ids(
+        get_railways_way_node_ids_path(), get_railways_ways_path(), ways_files
+    )
 
     # Step 2: Load coordinates for only the required nodes from PBF file
     node_coords = load_specific_node_coordinates(input_pbf, required_node_ids)
 
     # Step 3: Process each ways file
-    total_missing = 0
-    for i in range(len(ways_files)):
-        input_file = ways_files[i]
-        output_file = updated_files[i]
-
-        try:
-            missing_count = update_way_coordinates(input_file, node_coords, output_file)
-            total_missing += missing_count
-        except FileNotFoundError:
-            print(f"Warning: {input_file} not found, skipping...")
-        except Exception as e:
-            print(f"Error processing {input_file}: {e}")
+    total_missing = update_all_way_coordinates(ways_files, node_coords, updated_files)
 
     print("\nProcessing complete!")
     print(f"Total missing node references: {total_missing}")
@@ -1,5 +1,5 @@
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from config import (
     get_railways_ways_updated_paths,
     get_railways_ways_missing_path,
@@ -7,6 +7,14 @@ from config import (
     validate_configuration,
     print_configuration,
 )
+from geojson_io import FeatureCollectionWriter, FeatureSequenceWriter, iter_features
+
+
+def _has_nonzero_point(coordinates):
+    """Check if any [lon, lat] pair differs from [0, 0], stopping at the first"""
+    return any(
+        len(coord) == 2 and (coord[0] != 0 or coord[1] != 0) for coord in coordinates
+    )
 
 
 def has_valid_coordinates(feature):
@@ -38,11 +46,7 @@ def has_valid_coordinates(feature):
         if len(coordinates) < 2:
             return False
         # Check if all coordinates are [0, 0]
-        valid_points = 0
-        for coord in coordinates:
-            if len(coord) == 2 and not (coord[0] == 0 and coord[1] == 0):
-                valid_points += 1
-        return valid_points > 0
+        return _has_nonzero_point(coordinates)
 
     elif geometry_type == "Polygon":
         # Check polygon coordinates
@@ -52,76 +56,99 @@ def has_valid_coordinates(feature):
         exterior_ring = coordinates[0]
         if len(exterior_ring) < 3:
             return False
-        valid_points = 0
-        for coord in exterior_ring:
-            if len(coord) == 2 and not (coord[0] == 0 and coord[1] == 0):
-                valid_points += 1
-        return valid_points > 0
+        return _has_nonzero_point(exterior_ring)
 
     # For other geometry types, assume they're valid if they have coordinates
     return True
 
 
-def extract_missing_coordinates(input_files, output_file):
+def _worker_count(files):
+    """Number of worker processes to use for a list of files"""
+    return max(1, min(len(files), os.cpu_count() or 1))
+
+
+def _find_missing_in_file(input_file):
+    """
+    Collect the features of one file that have missing coordinates, marked
+    with their source file. Runs in a worker process.
+
+    Args:
+        input_file (str): Path to the input GeoJSON file
+
+    Returns:
+        tuple: List of features with missing coordinates and the number of
+            features processed
+    """
+    source_file = os.path.basename(input_file)
+    missing_features = []
+    processed = 0
+
+    # Features are streamed, so only the missing ones are kept in memory
+    for feature in iter_features(input_file):
+        processed += 1
+
+        if not has_valid_coordinates(feature):
+            # Add source file information to properties
+            feature["properties"]["source_file"] = source_file
+            feature["properties"]["missing_coordinates"] = True
+            missing_features.append(feature)
+
+    return missing_features, processed
+
+
+def extract_missing_coordinates(input_files, output_file, sequence=False):
     """
     Extract features with missing coordinates from multiple input files.
 
     Args:
         input_files (list): List of input GeoJSON file paths
         output_file (str): Path to output file for missing coordinates
+        sequence (bool): Write newline-delimited GeoJSON (one feature per
+            line, without the metadata) instead of a FeatureCollection
     """
     missing_features = []
     total_processed = 0
-    missing_count = 0
 
     print(f"Checking {len(input_files)} files for missing coordinates...")
 
+    # Check which files exist once, up front
+    existing_files = []
     for input_file in input_files:
-        if not os.path.exists(input_file):
+        if os.path.exists(input_file):
+            existing_files.append(input_file)
+        else:
             print(f"Warning: {input_file} not found, skipping...")
-            continue
 
-        print(f"Processing {input_file}...")
-
-        try:
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            file_missing = 0
-            for feature in data.get("features", []):
-                total_processed += 1
-
-                if not has_valid_coordinates(feature):
-                    # Add source file information to properties
-                    feature["properties"]["source_file"] = os.path.basename(input_file)
-                    feature["properties"]["missing_coordinates"] = True
-
-                    missing_features.append(feature)
-                    file_missing += 1
-                    missing_count += 1
-
-            print(f"  Found {file_missing} features with missing coordinates")
-
-        except Exception as e:
-            print(f"Error processing {input_file}: {e}")
-
-    # Create output GeoJSON
-    output_data = {
-        "type": "FeatureCollection",
-        "features": missing_features,
-        "metadata": {
-            "description": "Railway ways with missing or invalid coordinates",
-            "total_features": len(missing_features),
-            "source_files": [
-                os.path.basename(f) for f in input_files if os.path.exists(f)
-            ],
-            "extraction_criteria": "Features with [0,0] coordinates, empty coordinates, or invalid geometry",
-        },
-    }
+    # Files are checked in parallel, one worker process per file, and the
+    # results are collected in file order
+    with ProcessPoolExecutor(max_workers=_worker_count(existing_files)) as executor:
+        futures = [
+            executor.submit(_find_missing_in_file, input_file)
+            for input_file in existing_files
+        ]
+        for input_file, future in zip(existing_files, futures):
+            print(f"Processing {input_file}...")
+
+            try:
+                file_missing_features, file_processed = future.result()
+            except Exception as e:
+                print(f"Error processing {input_file}: {e}")
+                continue
+
+            total_processed += file_processed
+            missing_features.extend(file_missing_features)
+            print(
+                f"  Found {len(file_missing_features)} features with missing coordinates"
+            )
 
-    # Write output file
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    missing_count = len(missing_features)
+
+    if sequence:
+        with FeatureSequenceWriter(output_file) as writer:
+            for feature in missing_features:
+                writer.write(feature)
+    else:
+        _write_missing_collection(missing_features, existing_files, output_file)
 
     print(f"\n=== SUMMARY ===")
     print(f"Total features processed: {total_processed}")
@@ -132,54 +159,100 @@ def extract_missing_coordinates(input_files, output_file):
     return missing_count, total_processed
 
 
-def create_valid_coordinates_files(input_files, output_files=None):
+def _write_missing_collection(missing_features, source_files, output_file):
+    """Write the missing features as a FeatureCollection with metadata"""
+    metadata = {
+        "description": "Railway ways with missing or invalid coordinates",
+        "total_features": len(missing_features),
+        "source_files": [os.path.basename(f) for f in source_files],
+        "extraction_criteria": "Features with [0,0] coordinates, empty coordinates, or invalid geometry",
+    }
+
+    # Write output file
+    with FeatureCollectionWriter(output_file, members={"metadata": metadata}) as writer:
+        for feature in missing_features:
+            writer.write(feature)
+
+
+def create_valid_coordinates_files(input_files, output_files=None, sequence=False):
     """
     Create new files containing only features with valid coordinates.
 
     Args:
         input_files (list): List of input GeoJSON file paths
         output_files (list): List of output file paths (optional)
+        sequence (bool): Write newline-delimited GeoJSON (one feature per
+            line) instead of FeatureCollections
     """
     print(f"\nCreating files with valid coordinates only...")
 
+    jobs = []
     for i, input_file in enumerate(input_files):
         if not os.path.exists(input_file):
             continue
 
-        try:
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            valid_features = []
-            for feature in data.get("features", []):
-                if has_valid_coordinates(feature):
-                    valid_features.append(feature)
-
-            # Use provided output file or create default
-            if output_files and i < len(output_files):
-                output_file = output_files[i]
-            else:
-                output_file = f"railways_ways_valid_{i+1}.geojson"
-
-            output_data = {"type": "FeatureCollection", "features": valid_features}
+        # Use provided output file or create default
+        if output_files and i < len(output_files):
+            output_file = output_files[i]
+        else:
+            output_file = f"railways_ways_valid_{i+1}.geojson"
+        jobs.append((input_file, output_file))
+
+    # Files are written in parallel, one worker process per file
+    with ProcessPoolExecutor(max_workers=_worker_count(jobs)) as executor:
+        futures = [
+            executor.submit(_write_valid_features, input_file, output_file, sequence)
+            for input_file, output_file in jobs
+        ]
+        for (input_file, output_file), future in zip(jobs, futures):
+            try:
+                valid_count, original_count = future.result()
+                print(
+                    f"  {output_file}: {valid_count}/{original_count} features ({valid_count/original_count*100:.1f}% valid)"
+                )
+
+            except Exception as e:
+                print(f"Error processing {input_file}: {e}")
+
+
+def _write_valid_features(input_file, output_file, sequence):
+    """
+    Write the features of one file that have valid coordinates to an output
+    file. Runs in a worker process.
 
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, ensure_ascii=False, separators=(",", ":"))
+    Returns:
+        tuple: Number of valid features written and number of features read
+    """
+    writer_class = FeatureSequenceWriter if sequence else FeatureCollectionWriter
 
-            original_count = len(data.get("features", []))
-            valid_count = len(valid_features)
-            print(
-                f"  {output_file}: {valid_count}/{original_count} features ({valid_count/original_count*100:.1f}% valid)"
-            )
+    # Features are streamed from the input straight to the output
+    original_count = 0
+    features = iter_features(input_file)
+    with writer_class(output_file) as writer:
+        for feature in features:
+            original_count += 1
+            if has_valid_coordinates(feature):
+                writer.write(feature)
 
-        except Exception as e:
-            print(f"Error processing {input_file}: {e}")
+    return writer.count, original_count
 
 
 def main():
     """
     Main function to extract missing coordinates from updated railway ways files using configuration.
     """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Separate railway ways with missing coordinates"
+    )
+    parser.add_argument(
+        "--seq",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one feature per line)",
+    )
+    args = parser.parse_args()
+
     # Print configuration and validate
     print_configuration()
 
@@ -198,12 +271,12 @@ def main():
 
     # Extract missing coordinates
     missing_count, total_count = extract_missing_coordinates(
-        input_files, missing_output
+        input_files, missing_output, args.seq
     )
 
     # Optionally create "clean" files with only valid coordinates
     if missing_count > 0:
-        create_valid_coordinates_files(input_files, valid_outputs)
+        create_valid_coordinates_files(input_files, valid_outputs, args.seq)
         print(f"\nClean files (valid coordinates only) created in country directory")
 
 
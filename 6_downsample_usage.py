@@ -4,9 +4,11 @@ Simple downsample script for China railways data.
 Combines railways_ways_1-6_updated.geojson files and filters by usage only.
 """
 
-import json
+import orjson
 import os
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Tuple
+from geojson_io import FeatureCollectionWriter, iter_features
 
 # Configuration
 COUNTRY_DIR = "china"
@@ -18,64 +20,62 @@ KEEP_RAILWAY_TYPES = {"rail"}
 # Usage types to keep
 KEEP_USAGE_TYPES = {"main", "branch", "military", "freight"}
 
+# Service types to remove
+REMOVED_SERVICE_TYPES = {"crossover", "connector"}
 
-def filter_by_usage(properties: Dict[str, Any]) -> bool:
+
+def filter_by_usage(
+    properties: Dict[str, Any],
+    _railway_types=KEEP_RAILWAY_TYPES,
+    _usage_types=KEEP_USAGE_TYPES,
+    _removed_service_types=REMOVED_SERVICE_TYPES,
+) -> bool:
     """
     Filter function to check if a feature should be kept based on
     railway type and usage.
-    """
-    # Check if railway type should be kept (only rail)
-    railway_type = properties.get("railway", "")
-    if railway_type not in KEEP_RAILWAY_TYPES:
-        return False
-
-    # Check if usage type should be kept
-    usage_type = properties.get("usage", "")
-    if not usage_type or usage_type not in KEEP_USAGE_TYPES:
-        return False
 
-    # Remove anything with service IN ('crossover', 'connector')
-    service_type = properties.get("service", "")
-    if service_type in ("crossover", "connector"):
-        return False
-
-    return True
+    The keep/remove sets are bound as default arguments so that they are
+    local lookups in this per-feature call.
+    """
+    return (
+        # Railway type must be kept (only rail)
+        properties.get("railway") in _railway_types
+        # Usage type must be kept; features without usage are dropped
+        and properties.get("usage") in _usage_types
+        # Remove anything with service IN ('crossover', 'connector')
+        and properties.get("service") not in _removed_service_types
+    )
 
 
-def process_geojson_file(file_path: str) -> List[Dict[str, Any]]:
+def process_geojson_file(file_path: str) -> Tuple[List[Dict[str, Any]], int]:
     """
-    Process a single GeoJSON file and return filtered features.
+    Process a single GeoJSON file and return filtered features along with
+    the number of features it originally contained.
     """
-    print(f"Processing {file_path}...")
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    features = data.get("features", [])
-    total_features = len(features)
+    # Features are streamed, so only the kept ones are held in memory. They
+    # are reused as they are rather than rebuilt.
+    total_features = 0
     filtered_features = []
+    for feature in iter_features(file_path):
+        total_features += 1
+        if filter_by_usage(feature.get("properties") or {}):
+            filtered_features.append(feature)
 
-    print(f"  Filtering {total_features:,} features...")
-
-    for i, feature in enumerate(features):
-        # Progress tracking for large files
-        if i % 1000 == 0 or i == total_features - 1:
-            progress = ((i + 1) / total_features) * 100
-            print(f"    Progress: {progress:.1f}% ({i+1:,}/{total_features:,})")
+    return filtered_features, total_features
 
-        properties = feature.get("properties", {})
 
-        # Filter by usage
-        if filter_by_usage(properties):
-            filtered_feature = {
-                "type": "Feature",
-                "geometry": feature.get("geometry"),
-                "properties": properties,  # Keep all properties
-            }
-            filtered_features.append(filtered_feature)
-
-    print(f"  Kept {len(filtered_features):,} features out of {total_features:,}")
-    return filtered_features
+def _process_file_encoded(
+    file_path: str,
+) -> Tuple[List[bytes], int, List[Dict[str, Any]]]:
+    """
+    Process a single GeoJSON file in a worker process. The kept features are
+    returned already encoded as JSON, which is much cheaper to send back than
+    the feature dicts, along with the original feature count and the first
+    few kept features for the summary.
+    """
+    features, total_features = process_geojson_file(file_path)
+    encoded = [orjson.dumps(feature) for feature in features]
+    return encoded, total_features, features[:3]
 
 
 def combine_and_downsample():
@@ -105,32 +105,29 @@ def combine_and_downsample():
 
     print(f"Found {len(input_files)} input files to process")
 
-    # Process all files
+    output_path = os.path.join(COUNTRY_DIR, OUTPUT_FILE)
+    print(f"Writing output to: {output_path}")
+
+    # Process all files in parallel, one worker per file, writing the kept
+    # features in file order as each file's results arrive
     print(f"\nProcessing {len(input_files)} files...")
-    all_features = []
+    sample_features = []
     total_original_features = 0
 
-    for file_idx, file_path in enumerate(input_files):
-        print(
-            f"\nProcessing file {file_idx + 1}/{len(input_files)}: {os.path.basename(file_path)}"
-        )
-        features = process_geojson_file(file_path)
-        all_features.extend(features)
-
-        # Count original features for statistics
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        total_original_features += len(data.get("features", []))
-
-    # Create output GeoJSON
-    print("\nCreating output file...")
-    output_data = {"type": "FeatureCollection", "features": all_features}
-
-    # Write output file
-    output_path = os.path.join(COUNTRY_DIR, OUTPUT_FILE)
-    print(f"Writing output to: {output_path}")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, separators=(",", ":"))
+    with ProcessPoolExecutor(
+        max_workers=min(len(input_files), os.cpu_count() or 1)
+    ) as executor, FeatureCollectionWriter(output_path) as writer:
+        results = executor.map(_process_file_encoded, input_files)
+        for file_idx, (file_path, result) in enumerate(zip(input_files, results)):
+            encoded, file_total, samples = result
+            print(
+                f"\nProcessed file {file_idx + 1}/{len(input_files)}: {os.path.basename(file_path)}"
+            )
+            print(f"  Kept {len(encoded):,} features out of {file_total:,}")
+
+            writer.write_encoded(encoded)
+            total_original_features += file_total
+            sample_features.extend(samples[: 3 - len(sample_features)])
 
     print("✓ Output file created successfully!")
 
@@ -139,9 +136,9 @@ def combine_and_downsample():
     print("SIMPLE DOWNSAMPLE STATISTICS")
     print("=" * 60)
     print(f"Original features: {total_original_features:,}")
-    print(f"After usage filtering: {len(all_features):,}")
+    print(f"After usage filtering: {writer.count:,}")
     reduction_pct = (
-        (total_original_features - len(all_features)) / total_original_features * 100
+        (total_original_features - writer.count) / total_original_features * 100
     )
     print(f"Total reduction: {reduction_pct:.1f}%")
 
@@ -156,7 +153,7 @@ def combine_and_downsample():
 
     # Print some examples of filtered features
     print("\nSample of filtered features:")
-    for i, feature in enumerate(all_features[:3]):
+    for i, feature in enumerate(sample_features):
         props = feature.get("properties", {})
         railway_type = props.get("railway", "unknown")
         usage_type = props.get("usage", "unknown")
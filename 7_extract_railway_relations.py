@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
 Extract railway relationships from OSM PBF file
-Requires: pip install osmium-tool geojson
+Requires: pip install osmium-tool orjson
 
 This script extracts all railway-related relations from an OSM PBF file,
 including route relations, network relations, and other railway-related
 organizational structures.
 """
 
+import os
 import osmium
-import geojson
+import re
 import time
-from collections import defaultdict
+from collections import Counter, defaultdict
+from itertools import islice
 from config import (
     get_input_path,
     get_railways_relations_path,
@@ -19,13 +21,27 @@ from config import (
     validate_configuration,
     print_configuration,
 )
+from geojson_io import FeatureCollectionWriter, FeatureSequenceWriter
+
+# Relation types that are railway-related when they have a rail route tag
+RAILWAY_RELATION_TYPES = frozenset(
+    {"route", "network", "multipolygon", "boundary", "site"}
+)
+
+# Lowercased keys or values mentioning railway, railroad or train
+RAILWAY_PATTERN = re.compile(r"rail(?:way|road)|train")
 
 
 class RailwayRelationsExtractor(osmium.SimpleHandler):
-    """Extract railway relations from OSM PBF file"""
+    """
+    Extract railway relations from OSM PBF file.
+    Features are written to the given writer as they are found instead of
+    being kept in memory.
+    """
 
-    def __init__(self, progress_interval=50000):
+    def __init__(self, writer, progress_interval=50000):
         osmium.SimpleHandler.__init__(self)
+        self.writer = writer
         self.progress_interval = progress_interval
 
         # Progress tracking
@@ -33,8 +49,8 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
         self.railway_relations_count = 0
         self.start_time = time.time()
 
-        # Store railway relations
-        self.railway_relations = []
+        # First railway relation features, for the summary
+        self.sample_features = []
 
         print("Starting railway relations extraction...")
         print(f"Progress will be reported every {progress_interval:,} features")
@@ -55,34 +71,16 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
 
     def _is_railway_relation(self, tags):
         """Check if relation has railway-related tags"""
-        for tag in tags:
+        railway_relation_type = False
+        rail_route = False
+
+        # Reading exactly len(tags) tags stops before pyosmium signals the end
+        # of the list with an exception from C++, which costs more than
+        # reading the tags themselves
+        for tag in islice(tags, len(tags)):
             key = tag.k.lower()
             value = tag.v.lower()
 
-            # Main railway relation types
-            if key == "type" and value in [
-                "route",
-                "network",
-                "multipolygon",
-                "boundary",
-                "site",
-            ]:
-                # Check if it's railway-related
-                for other_tag in tags:
-                    other_key = other_tag.k.lower()
-                    other_value = other_tag.v.lower()
-
-                    if (
-                        (other_key == "route" and "rail" in other_value)
-                        or (other_key == "railway")
-                        or (other_key == "public_transport" and "rail" in other_value)
-                        or ("railway" in other_key)
-                        or ("railway" in other_value)
-                        or ("railroad" in other_key)
-                        or ("railroad" in other_value)
-                    ):
-                        return True
-
             # Direct railway tags
             if key == "railway":
                 return True
@@ -92,17 +90,17 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
                 return True
 
             # Railway-related keywords
-            if (
-                "railway" in key
-                or "railway" in value
-                or "railroad" in key
-                or "railroad" in value
-                or "train" in key
-                or "train" in value
-            ):
+            if RAILWAY_PATTERN.search(key) or RAILWAY_PATTERN.search(value):
                 return True
 
-        return False
+            # Route, network, etc. relations are railway-related when they
+            # also have a rail route tag, which is tracked in the same pass
+            if key == "type" and value in RAILWAY_RELATION_TYPES:
+                railway_relation_type = True
+            elif key == "route" and "rail" in value:
+                rail_route = True
+
+        return railway_relation_type and rail_route
 
     def _create_feature_properties(self, osm_id, osm_type, tags, members):
         """Create GeoJSON properties from OSM relation data"""
@@ -112,21 +110,19 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
             "member_count": len(members),
         }
 
+        # Read the members once, stopping before the end-of-list exception
+        # like _is_railway_relation does for tags
+        members = list(islice(members, len(members)))
+
         # Add all tags as properties
         for tag in tags:
             properties[tag.k] = tag.v
 
         # Add member information
-        member_types = defaultdict(int)
-        member_roles = defaultdict(int)
-
-        for member in members:
-            member_types[member.type] += 1
-            member_roles[member.role] += 1
-
-        properties["member_types"] = dict(member_types)
-        properties["member_roles"] = dict(member_roles)
-        properties["member_ids"] = [int(member.ref) for member in members]
+        properties["member_types"] = dict(Counter(member.type for member in members))
+        properties["member_roles"] = dict(Counter(member.role for member in members))
+        # member.ref is already an int
+        properties["member_ids"] = [member.ref for member in members]
 
         return properties
 
@@ -147,12 +143,15 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
 
             # Create a placeholder point geometry since GeoJSON requires geometry
             # The real data is in the properties
-            feature = geojson.Feature(
-                geometry=geojson.Point([0, 0]),  # Placeholder geometry
-                properties=properties,
-            )
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [0, 0]},  # Placeholder
+                "properties": properties,
+            }
 
-            self.railway_relations.append(feature)
+            self.writer.write(feature)
+            if len(self.sample_features) < 1000:
+                self.sample_features.append(feature)
 
             # Show first few relations
             if self.railway_relations_count <= 3:
@@ -164,7 +163,9 @@ class RailwayRelationsExtractor(osmium.SimpleHandler):
                 )
 
 
-def extract_railway_relations(input_pbf, output_geojson, progress_interval=50000):
+def extract_railway_relations(
+    input_pbf, output_geojson, progress_interval=50000, sequence=False
+):
     """
     Extract railway relations from OSM PBF file
 
@@ -172,19 +173,31 @@ def extract_railway_relations(input_pbf, output_geojson, progress_interval=50000
         input_pbf: Path to input .osm.pbf file
         output_geojson: Path to output .geojson file
         progress_interval: How often to print progress
+        sequence: Write newline-delimited GeoJSON (one feature per line)
+            instead of a FeatureCollection
     """
     print(f"Extracting railway relations from {input_pbf}")
     print(f"Output will be saved to: {output_geojson}")
     print("-" * 60)
 
     try:
-        # Create extractor and process file
-        extractor = RailwayRelationsExtractor(progress_interval)
-        extractor.apply_file(input_pbf)
+        # Check the input before the output file is created
+        if not os.path.exists(input_pbf):
+            raise FileNotFoundError(input_pbf)
+
+        if sequence:
+            writer = FeatureSequenceWriter(output_geojson)
+        else:
+            writer = FeatureCollectionWriter(output_geojson)
+
+        # Create extractor and process file, writing relations as they are found
+        with writer:
+            extractor = RailwayRelationsExtractor(writer, progress_interval)
+            extractor.apply_file(input_pbf)
 
         # Print final statistics
         elapsed = time.time() - extractor.start_time
-        total_features = len(extractor.railway_relations)
+        total_features = writer.count
 
         print("\n" + "=" * 60)
         print("EXTRACTION COMPLETE!")
@@ -198,15 +211,6 @@ def extract_railway_relations(input_pbf, output_geojson, progress_interval=50000
         )
 
         if total_features > 0:
-            # Create GeoJSON FeatureCollection
-            print("\nCreating GeoJSON FeatureCollection...")
-            feature_collection = geojson.FeatureCollection(extractor.railway_relations)
-
-            # Write to file
-            print(f"Writing to {output_geojson}...")
-            with open(output_geojson, "w", encoding="utf-8") as f:
-                geojson.dump(feature_collection, f, indent=2, ensure_ascii=False)
-
             print(
                 f"✅ Successfully saved {total_features:,} railway relations "
                 f"to {output_geojson}"
@@ -218,7 +222,7 @@ def extract_railway_relations(input_pbf, output_geojson, progress_interval=50000
             route_types = defaultdict(int)
             railway_types = defaultdict(int)
 
-            for feature in extractor.railway_relations[:1000]:
+            for feature in extractor.sample_features:  # Sample first 1000
                 props = feature["properties"]
 
                 relation_type = props.get("type", "other")
@@ -249,9 +253,9 @@ def extract_railway_relations(input_pbf, output_geojson, progress_interval=50000
                 print(f"    {rail_type}: {count:,}")
 
             # Show structure of first feature
-            if extractor.railway_relations:
+            if extractor.sample_features:
                 print("\nSample relation structure:")
-                sample = extractor.railway_relations[0]["properties"]
+                sample = extractor.sample_features[0]["properties"]
                 print(f"  OSM ID: {sample['osm_id']}")
                 print(f"  Type: {sample.get('type', 'N/A')}")
                 print(f"  Route: {sample.get('route', 'N/A')}")
@@ -299,7 +303,7 @@ def debug_run():
             input_path, output_path, PROGRESS_INTERVAL
         )
 
-        if extractor and extractor.railway_relations:
+        if extractor and extractor.railway_relations_count:
             print("\n🚂 Railway relations extraction completed successfully!")
             print(f"   Output: {output_path}")
             print("   Contains: Relation IDs, tags, member information")
@@ -329,10 +333,15 @@ def main():
         default=50000,
         help="Progress interval (default: 50000)",
     )
+    parser.add_argument(
+        "--seq",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one feature per line)",
+    )
 
     args = parser.parse_args()
 
-    extract_railway_relations(args.input, args.output, args.progress)
+    extract_railway_relations(args.input, args.output, args.progress, args.seq)
 
 
 # =============================================================================
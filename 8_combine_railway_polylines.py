@@ -13,37 +13,125 @@ Output:
 - china/railways_combined_polylines.geojson: Combined polylines for each relationship
 """
 
-import geojson
-import json
+import multiprocessing
+import numpy as np
+import orjson
+import os
+import shapely
 from collections import defaultdict
-from shapely.geometry import LineString, MultiLineString
-from shapely.ops import linemerge
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 import time
+from geojson_io import (
+    FeatureCollectionWriter,
+    FeatureSequenceWriter,
+    iter_features,
+    round_coordinate_array,
+)
+
+# Decimal places kept in way coordinates. The combined output has always
+# been written at this precision, and nearby way endpoints are merged based
+# on the rounded values.
+COORDINATE_PRECISION = 6
+
+# Way lookup shared with forked worker processes, which inherit it
+# copy-on-write instead of receiving a pickled copy per task
+_shared_way_lookup = None
+
+# Number of LineString ways whose coordinates are converted together. Small
+# batches keep the parsed coordinate lists short-lived, which matters more
+# for garbage collection than the per-batch numpy overhead.
+WAY_BATCH_SIZE = 100
+
+# Number of relations combined per worker task
+RELATION_CHUNK_SIZE = 100
 
 
 def load_geojson_file(filepath):
     """Load a GeoJSON file and return the feature collection"""
     print(f"Loading {filepath}...")
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = geojson.load(f)
+    with open(filepath, "rb") as f:
+        data = orjson.loads(f.read())
     print(f"Loaded {len(data['features'])} features")
     return data
 
 
-def create_way_lookup(ways_data):
-    """Create a lookup dictionary from OSM ID to way geometry and properties"""
-    print("Creating way lookup dictionary...")
-    way_lookup = {}
+def create_way_lookup(ways_file):
+    """
+    Create a lookup from OSM ID to way geometry and properties.
+    Ways are streamed from the file and added one at a time, so the feature
+    collection is never held in memory as a whole.
+
+    The lookup is kept as parallel lists of geometries and properties plus a
+    dictionary from OSM ID to list index, so no extra dict is built per way.
+    LineString coordinates are stored as float64 (n, 2) arrays, converted in
+    batches of ways, instead of nested lists of floats.
+
+    Returns:
+        Tuple of (way_lookup, way_count), where way_lookup is a tuple of
+        (way_index, way_geometries, way_properties)
+    """
+    print(f"Creating way lookup dictionary from {ways_file}...")
+    way_index = {}
+    way_geometries = []
+    way_properties = []
+    way_count = 0
+
+    # LineString geometries whose coordinates are converted in the next batch
+    line_geometries = []
 
-    for feature in ways_data["features"]:
-        osm_id = feature["properties"]["osm_id"]
+    for feature in iter_features(ways_file):
+        way_count += 1
         geometry = feature["geometry"]
         properties = feature["properties"]
 
-        way_lookup[osm_id] = {"geometry": geometry, "properties": properties}
+        if geometry["type"] == "LineString":
+            line_geometries.append(geometry)
+            if len(line_geometries) == WAY_BATCH_SIZE:
+                convert_line_coordinates(line_geometries)
+                line_geometries = []
+
+        way_index[properties["osm_id"]] = len(way_geometries)
+        way_geometries.append(geometry)
+        way_properties.append(properties)
+
+    convert_line_coordinates(line_geometries)
+
+    print(f"Loaded {way_count} features")
+    print(f"Created lookup for {len(way_index)} ways")
+    return (way_index, way_geometries, way_properties), way_count
+
+
+def convert_line_coordinates(line_geometries):
+    """
+    Replace the coordinate lists of LineString geometries with rounded float64
+    (n, 2) arrays, converting all of them with one array operation
+
+    Args:
+        line_geometries: List of LineString geometries, updated in place
+    """
+    line_lengths = [len(geometry["coordinates"]) for geometry in line_geometries]
+    points = list(
+        chain.from_iterable(geometry["coordinates"] for geometry in line_geometries)
+    )
+
+    # The batch array is built in (lon, lat) pairs, so any position with a
+    # different size would shift or break every coordinate after it
+    position_sizes = np.fromiter(map(len, points), dtype=np.int64, count=len(points))
+    if (position_sizes < 2).any():
+        raise ValueError("Line positions must have at least 2 values (lon, lat)")
+    if (position_sizes > 2).any():
+        # Drop z and any further values; the combined output is 2D either way
+        points = [position[:2] for position in points]
+
+    coords_array = round_coordinate_array(
+        np.array(points, dtype=np.float64).reshape(-1, 2), COORDINATE_PRECISION
+    )
 
-    print(f"Created lookup for {len(way_lookup)} ways")
-    return way_lookup
+    # Each geometry gets a view of its part of the batch array
+    line_coords = np.split(coords_array, np.cumsum(line_lengths)[:-1])
+    for geometry, coords in zip(line_geometries, line_coords):
+        geometry["coordinates"] = coords
 
 
 def combine_polylines_for_relation(relation, way_lookup):
@@ -52,88 +140,167 @@ def combine_polylines_for_relation(relation, way_lookup):
 
     Args:
         relation: GeoJSON feature representing a railway relation
-        way_lookup: Dictionary mapping OSM ID to way data
+        way_lookup: Way index, geometries and properties from create_way_lookup
 
     Returns:
-        Combined geometry (MultiLineString or LineString) or None if no ways found
+        Tuple of (combined geometry, member way IDs found in way_lookup), where
+        the geometry is a MultiLineString or LineString, or None if no ways
+        were found
     """
     member_ids = relation["properties"].get("member_ids", [])
 
     if not member_ids:
-        return None
+        return None, []
 
-    # Collect all LineString geometries for this relation
-    line_strings = []
+    way_index, way_geometries, _ = way_lookup
+
+    # Collect the coordinate arrays of all LineString geometries for this relation
+    line_coords = []
+    line_lengths = []
+    found_way_ids = []
 
     for member_id in member_ids:
-        if member_id in way_lookup:
-            way_data = way_lookup[member_id]
-            geometry = way_data["geometry"]
+        i = way_index.get(member_id)
+        if i is not None:
+            found_way_ids.append(member_id)
+            geometry = way_geometries[i]
 
             # Only process LineString geometries
             if geometry["type"] == "LineString":
                 coords = geometry["coordinates"]
                 if len(coords) >= 2:  # Valid LineString needs at least 2 points
-                    line_strings.append(LineString(coords))
+                    line_coords.append(coords)
+                    line_lengths.append(len(coords))
+
+    if not line_lengths:
+        return None, found_way_ids
 
-    if not line_strings:
-        return None
+    # Build all LineStrings with one call
+    line_strings = shapely.linestrings(
+        np.concatenate(line_coords),
+        indices=np.repeat(np.arange(len(line_lengths)), line_lengths),
+    )
 
     # Try to merge connected LineStrings
     try:
-        merged = linemerge(line_strings)
+        merged = shapely.line_merge(shapely.multilinestrings(line_strings))
 
         # Convert back to GeoJSON geometry
         if merged.geom_type == "LineString":
-            return geojson.LineString(list(merged.coords))
+            geometry = {
+                "type": "LineString",
+                "coordinates": shapely.get_coordinates(merged).tolist(),
+            }
         elif merged.geom_type == "MultiLineString":
-            return geojson.MultiLineString([list(line.coords) for line in merged.geoms])
+            geometry = {
+                "type": "MultiLineString",
+                "coordinates": _line_coordinates(shapely.get_parts(merged)),
+            }
         else:
             # Fallback: return as MultiLineString
-            return geojson.MultiLineString([list(line.coords) for line in line_strings])
+            geometry = {
+                "type": "MultiLineString",
+                "coordinates": _line_coordinates(line_strings),
+            }
 
     except Exception as e:
         print(
             f"Warning: Could not merge lines for relation {relation['properties']['osm_id']}: {e}"
         )
         # Fallback: return as MultiLineString
-        return geojson.MultiLineString([list(line.coords) for line in line_strings])
+        geometry = {
+            "type": "MultiLineString",
+            "coordinates": _line_coordinates(line_strings),
+        }
+
+    return geometry, found_way_ids
+
+
+def _line_coordinates(line_strings):
+    """Get the coordinate lists of an array of LineStrings"""
+    coords, index = shapely.get_coordinates(line_strings, return_index=True)
+    ends = np.cumsum(np.bincount(index, minlength=len(line_strings)))[:-1]
+    return [line_coords.tolist() for line_coords in np.split(coords, ends)]
+
 
+def _combine_shared_relation_chunk(relations):
+    """Combine the polylines of relations in a worker using the inherited lookup"""
+    return [
+        combine_polylines_for_relation(relation, _shared_way_lookup)
+        for relation in relations
+    ]
 
-def process_railway_relations(relations_data, way_lookup):
+
+def combine_all_relations(relations, way_lookup):
     """
-    Process all railway relations and combine their polylines
+    Combine the polylines of all relations, in chunks spread over worker
+    processes where the fork start method and more than one CPU are available
+    and sequentially otherwise.
+
+    Args:
+        relations: List of GeoJSON features representing railway relations
+        way_lookup: Way index, geometries and properties from create_way_lookup
+
+    Yields:
+        Results of combine_polylines_for_relation, in relation order
+    """
+    global _shared_way_lookup
+
+    parallel = (os.cpu_count() or 1) > 1
+    if not parallel or "fork" not in multiprocessing.get_all_start_methods():
+        for relation in relations:
+            yield combine_polylines_for_relation(relation, way_lookup)
+        return
+
+    chunks = [
+        relations[start : start + RELATION_CHUNK_SIZE]
+        for start in range(0, len(relations), RELATION_CHUNK_SIZE)
+    ]
+
+    # Workers are forked when the chunks are submitted, after the lookup is set
+    _shared_way_lookup = way_lookup
+    try:
+        with ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            for results in executor.map(_combine_shared_relation_chunk, chunks):
+                yield from results
+    finally:
+        _shared_way_lookup = None
+
+
+def process_railway_relations(relations_data, way_lookup, used_way_ids):
+    """
+    Process all railway relations and combine their polylines.
+    Features are yielded one at a time so they can be written as they are
+    produced.
 
     Args:
         relations_data: GeoJSON FeatureCollection of railway relations
-        way_lookup: Dictionary mapping OSM ID to way data
+        way_lookup: Way index, geometries and properties from create_way_lookup
+        used_way_ids: Set that the IDs of ways used in relations are added to
 
-    Returns:
-        Tuple of (combined_features, used_way_ids)
+    Yields:
+        GeoJSON features with the combined polyline of each relation
     """
     print("Processing railway relations...")
-    combined_features = []
-    used_way_ids = set()
+    relations = relations_data["features"]
     processed_count = 0
     successful_count = 0
 
-    for relation in relations_data["features"]:
+    # Combined polylines for each relation
+    for relation, (combined_geometry, found_way_ids) in zip(
+        relations, combine_all_relations(relations, way_lookup)
+    ):
         processed_count += 1
 
         if processed_count % 100 == 0:
-            print(
-                f"Processed {processed_count}/{len(relations_data['features'])} relations"
-            )
-
-        # Combine polylines for this relation
-        combined_geometry = combine_polylines_for_relation(relation, way_lookup)
+            print(f"Processed {processed_count}/{len(relations)} relations")
 
         if combined_geometry is not None:
             # Track which ways were used in this relation
+            used_way_ids.update(found_way_ids)
             member_ids = relation["properties"].get("member_ids", [])
-            for member_id in member_ids:
-                if member_id in way_lookup:
-                    used_way_ids.add(member_id)
 
             # Create new feature with combined geometry
             new_properties = relation["properties"].copy()
@@ -141,60 +308,101 @@ def process_railway_relations(relations_data, way_lookup):
             new_properties["geometry_type"] = combined_geometry["type"]
             new_properties["source"] = "relation"
 
-            combined_feature = geojson.Feature(
-                geometry=combined_geometry, properties=new_properties
-            )
-
-            combined_features.append(combined_feature)
+            yield {
+                "type": "Feature",
+                "geometry": combined_geometry,
+                "properties": new_properties,
+            }
             successful_count += 1
 
     print(
         f"Successfully combined polylines for {successful_count}/{processed_count} relations"
     )
     print(f"Used {len(used_way_ids)} ways in relations")
-    return combined_features, used_way_ids
 
 
 def process_standalone_ways(way_lookup, used_way_ids):
     """
-    Process railway ways that are not part of any relation
+    Process railway ways that are not part of any relation.
+    Features are yielded one at a time; used_way_ids has to be complete when
+    the first one is requested.
 
     Args:
-        way_lookup: Dictionary mapping OSM ID to way data
+        way_lookup: Way index, geometries and properties from create_way_lookup
         used_way_ids: Set of way IDs that are already used in relations
 
-    Returns:
-        List of GeoJSON features for standalone ways
+    Yields:
+        GeoJSON features for standalone ways
     """
     print("Processing standalone railway ways...")
-    standalone_features = []
+    way_index, way_geometries, way_properties = way_lookup
+    standalone_count = 0
 
-    for osm_id, way_data in way_lookup.items():
-        if osm_id not in used_way_ids:
-            geometry = way_data["geometry"]
-            properties = way_data["properties"].copy()
+    # Ways not used in any relation, found with a single set difference and
+    # kept in their original order
+    standalone_indexes = sorted(
+        way_index[osm_id] for osm_id in way_index.keys() - used_way_ids
+    )
 
-            # Only process LineString geometries
-            if geometry["type"] == "LineString":
-                coords = geometry["coordinates"]
-                if len(coords) >= 2:  # Valid LineString needs at least 2 points
-                    # Add metadata to indicate this is a standalone way
-                    properties["source"] = "standalone_way"
-                    properties["geometry_type"] = "LineString"
-                    properties["combined_way_count"] = 1
+    for i in standalone_indexes:
+        geometry = way_geometries[i]
+        properties = way_properties[i].copy()
 
-                    standalone_feature = geojson.Feature(
-                        geometry=geometry, properties=properties
-                    )
+        # Only process LineString geometries
+        if geometry["type"] == "LineString":
+            coords = geometry["coordinates"]
+            if len(coords) >= 2:  # Valid LineString needs at least 2 points
+                # Add metadata to indicate this is a standalone way
+                properties["source"] = "standalone_way"
+                properties["geometry_type"] = "LineString"
+                properties["combined_way_count"] = 1
 
-                    standalone_features.append(standalone_feature)
+                yield {
+                    "type": "Feature",
+                    "geometry": {"type": "LineString", "coordinates": coords.tolist()},
+                    "properties": properties,
+                }
+                standalone_count += 1
 
-    print(f"Found {len(standalone_features)} standalone railway ways")
-    return standalone_features
+    print(f"Found {standalone_count} standalone railway ways")
+
+
+def write_features(writer, features):
+    """
+    Write features to the output collection as they are produced
+
+    Args:
+        writer: FeatureCollectionWriter for the output file
+        features: Iterable of GeoJSON features
+
+    Returns:
+        Tuple of (number of features written, first feature or None)
+    """
+    start_count = writer.count
+    first_feature = None
+
+    for feature in features:
+        if first_feature is None:
+            first_feature = feature
+        writer.write(feature)
+
+    return writer.count - start_count, first_feature
 
 
 def main():
     """Main function to combine railway polylines"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Combine railway polylines for each railway relation"
+    )
+    parser.add_argument(
+        "--seq",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one feature per line)",
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("RAILWAY POLYLINE COMBINER")
     print("=" * 60)
@@ -210,30 +418,25 @@ def main():
         # Load railway relations
         relations_data = load_geojson_file(relations_file)
 
-        # Load railway ways
-        ways_data = load_geojson_file(ways_file)
+        # Create way lookup, streaming the railway ways
+        way_lookup, way_count = create_way_lookup(ways_file)
 
-        # Create way lookup
-        way_lookup = create_way_lookup(ways_data)
-
-        # Process relations and combine polylines
-        combined_features, used_way_ids = process_railway_relations(
-            relations_data, way_lookup
-        )
-
-        # Process standalone railway ways
-        standalone_features = process_standalone_ways(way_lookup, used_way_ids)
-
-        # Combine all features
-        all_features = combined_features + standalone_features
-
-        # Create output GeoJSON
-        output_collection = geojson.FeatureCollection(all_features)
-
-        # Write to file
+        # Write features to file as they are produced, so the output is
+        # never held in memory as a whole
         print(f"\nWriting combined polylines to {output_file}...")
-        with open(output_file, "w", encoding="utf-8") as f:
-            geojson.dump(output_collection, f, ensure_ascii=False)
+        used_way_ids = set()
+        writer_class = FeatureSequenceWriter if args.seq else FeatureCollectionWriter
+        with writer_class(output_file) as writer:
+            # Process relations and combine polylines
+            combined_count, combined_sample = write_features(
+                writer,
+                process_railway_relations(relations_data, way_lookup, used_way_ids),
+            )
+
+            # Process standalone railway ways, once all used ways are known
+            standalone_count, standalone_sample = write_features(
+                writer, process_standalone_ways(way_lookup, used_way_ids)
+            )
 
         # Print summary
         elapsed_time = time.time() - start_time
@@ -242,20 +445,20 @@ def main():
         print("=" * 60)
         print(f"Processing time: {elapsed_time:.1f} seconds")
         print(f"Input relations: {len(relations_data['features'])}")
-        print(f"Input ways: {len(ways_data['features'])}")
-        print(f"Combined relation polylines: {len(combined_features)}")
-        print(f"Standalone railway ways: {len(standalone_features)}")
-        print(f"Total output features: {len(all_features)}")
+        print(f"Input ways: {way_count}")
+        print(f"Combined relation polylines: {combined_count}")
+        print(f"Standalone railway ways: {standalone_count}")
+        print(f"Total output features: {writer.count}")
         print(f"Output file: {output_file}")
 
         # Show sample of results
-        if all_features:
+        if writer.count:
             print("\nSample features:")
 
             # Show sample combined polyline
-            if combined_features:
+            if combined_sample is not None:
                 print("\nSample combined polyline (from relation):")
-                sample = combined_features[0]
+                sample = combined_sample
                 props = sample["properties"]
                 geom = sample["geometry"]
 
@@ -273,9 +476,9 @@ def main():
                     print(f"  Total coordinates: {total_coords}")
 
             # Show sample standalone way
-            if standalone_features:
+            if standalone_sample is not None:
                 print("\nSample standalone railway way:")
-                sample = standalone_features[0]
+                sample = standalone_sample
                 props = sample["properties"]
                 geom = sample["geometry"]
 
@@ -4,14 +4,66 @@ Script to flatten GeoJSON files by removing unnecessary whitespace
 while preserving the JSON structure for better size comparison.
 """
 
-import json
 import os
+import shutil
+from itertools import filterfalse
 from pathlib import Path
+import ijson
+import orjson
+from geojson_io import FeatureCollectionWriter, iter_features
+
+# Number of bytes at the start of a file checked for whitespace
+FLAT_CHECK_SIZE = 4096
+
+
+def is_flattened(input_file: str) -> bool:
+    """
+    Check whether a GeoJSON file is already flattened, judging by the
+    whitespace at its start.
+
+    Args:
+        input_file: Path to the GeoJSON file
+
+    Returns:
+        True if no whitespace separators or indentation were found
+    """
+    with open(input_file, "rb") as f:
+        head = f.read(FLAT_CHECK_SIZE)
+    return b", " not in head and b": " not in head and b"\n " not in head
+
+
+def _is_feature_event(event) -> bool:
+    """Check if an ijson parse event belongs to the features array."""
+    prefix = event[0]
+    return prefix == "features" or prefix.startswith("features.")
+
+
+def read_top_level_members(input_file: str):
+    """
+    Read the top-level JSON value of a file with the features array left
+    out, so the other members of a FeatureCollection (type, bbox, crs or
+    custom metadata) can be kept without building any features.
+
+    Args:
+        input_file: Path to the GeoJSON file
+
+    Returns:
+        Tuple of (top-level value without "features", whether the file has a
+        top-level "features" member)
+    """
+    with open(input_file, "rb") as f:
+        events = list(filterfalse(_is_feature_event, ijson.parse(f, use_float=True)))
+    has_features = ("", "map_key", "features") in events
+    return next(ijson.items(iter(events), "")), has_features
 
 
 def flatten_geojson(input_file: str, output_file: str = None) -> None:
     """
     Flatten a GeoJSON file by removing unnecessary whitespace.
+    The features of a FeatureCollection are streamed from the input to the
+    output one at a time, so the file is never held in memory; its other
+    top-level members are kept and written before the features. Any other
+    JSON document is flattened as a whole.
 
     Args:
         input_file: Path to the input GeoJSON file
@@ -26,10 +78,6 @@ def flatten_geojson(input_file: str, output_file: str = None) -> None:
 
     print(f"Reading {input_file}...")
 
-    # Read the original file
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     # Get original file size
     original_size = os.path.getsize(input_file)
 
@@ -39,8 +87,34 @@ def flatten_geojson(input_file: str, output_file: str = None) -> None:
 
     # Write flattened version
     print(f"Writing flattened version to {output_file}...")
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+    if is_flattened(input_file):
+        # Nothing to remove, so skip parsing and re-encoding the features
+        if os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+            print("Input is already flattened, leaving it unchanged")
+        else:
+            print("Input is already flattened, copying it unchanged")
+            shutil.copyfile(input_file, output_file)
+    else:
+        members, has_features = read_top_level_members(input_file)
+        if (
+            isinstance(members, dict)
+            and members.get("type") == "FeatureCollection"
+            and has_features
+        ):
+            members.pop("type")
+            # Writing goes to a temporary file, so the output may be the input
+            features = iter_features(input_file)
+            with FeatureCollectionWriter(output_file, members=members) as writer:
+                for feature in features:
+                    writer.write(feature)
+        else:
+            print("Input is not a FeatureCollection, flattening it as a whole")
+            with open(input_file, "rb") as f:
+                data = orjson.loads(f.read())
+            temp_file = f"{output_file}.tmp"
+            with open(temp_file, "wb") as f:
+                f.write(orjson.dumps(data))
+            os.replace(temp_file, output_file)
 
     # Get new file size
     new_size = os.path.getsize(output_file)
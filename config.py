@@ -6,6 +6,7 @@ Contains all constants and settings used across the conversion scripts
 
 import os
 import re
+from functools import lru_cache
 
 # =============================================================================
 # GLOBAL CONFIGURATION CONSTANTS
@@ -17,6 +18,9 @@ INPUT_PBF_FILENAME = "china-250907.osm.pbf"
 # Processing configuration
 NUM_SPLITS = 6  # Number of files to split railways_ways into
 PROGRESS_INTERVAL = 50000  # Print progress every N features
+# Assign way coordinates from node locations while extracting ways (module 2),
+# so module 3 writes the updated split files directly and module 4 is skipped
+WAYS_WITH_LOCATIONS = False
 
 # Output directory configuration
 # All output files will be placed in a country-specific subdirectory
@@ -26,6 +30,9 @@ BASE_OUTPUT_DIR = os.getcwd()  # Use current working directory as base
 # DERIVED CONFIGURATION (automatically calculated)
 # =============================================================================
 
+# Pattern: country-name-YYYYMMDD -> country-name
+_COUNTRY_RE = re.compile(r"^(.+)-(\d{6,8})$")
+
 
 def get_country_name(pbf_filename):
     """
@@ -41,8 +48,7 @@ def get_country_name(pbf_filename):
     base_name = pbf_filename.replace(".osm.pbf", "")
 
     # Extract country name (everything before the last dash followed by numbers)
-    # Pattern: country-name-YYYYMMDD -> country-name
-    match = re.match(r"^(.+)-(\d{6,8})$", base_name)
+    match = _COUNTRY_RE.match(base_name)
     if match:
         return match.group(1)
 
@@ -50,9 +56,11 @@ def get_country_name(pbf_filename):
     return base_name
 
 
+@lru_cache(maxsize=None)
 def get_output_directory():
     """
     Get the output directory for the current country.
+    Computed once, as it only depends on the constants above.
 
     Returns:
         str: Path to country-specific output directory
@@ -87,6 +95,11 @@ def get_railways_ways_path():
     return os.path.join(get_output_directory(), "railways_ways.geojson")
 
 
+def get_railways_way_node_ids_path():
+    """Get path for the sorted node IDs referenced by railway ways"""
+    return os.path.join(get_output_directory(), "railways_way_node_ids.npy")
+
+
 def get_railways_ways_missing_path():
     """Get path for railways ways missing coordinates file"""
     return os.path.join(
@@ -154,6 +167,7 @@ def print_configuration():
     print(f"Output directory: {get_output_directory()}")
     print(f"Number of splits: {NUM_SPLITS}")
     print(f"Progress interval: {PROGRESS_INTERVAL:,}")
+    print(f"Ways with locations: {WAYS_WITH_LOCATIONS}")
     print("=" * 60)
 
 
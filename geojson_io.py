@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Shared GeoJSON reading and writing helpers for the conversion scripts
+Streams features from and to large FeatureCollections instead of holding
+whole files in memory, and rounds coordinates the same way in every module
+"""
+
+import os
+from itertools import islice
+
+import ijson
+import numpy as np
+import orjson
+
+# Output buffer size; features are written as many small chunks, so a larger
+# buffer than the default cuts the number of write calls
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def iter_features(filepath):
+    """
+    Iterate over the features of a GeoJSON FeatureCollection one at a time,
+    without loading the whole file into memory. The file is opened right
+    away, so a missing file raises here rather than on first iteration.
+
+    Args:
+        filepath (str): Path to the GeoJSON file
+
+    Returns:
+        Iterator[dict]: GeoJSON features
+    """
+    return _iter_file_features(open(filepath, "rb"))
+
+
+def _iter_file_features(f):
+    """Yield the features of an open GeoJSON file, closing it when done."""
+    with f:
+        # use_float keeps coordinates as floats instead of Decimal
+        yield from ijson.items(f, "features.item", use_float=True)
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size consecutive items from an iterable, e.g. to
+    process streamed features in batches.
+
+    Args:
+        iterable: Items to batch
+        size (int): Maximum number of items per batch
+
+    Returns:
+        Iterator[list]: Batches of items, in order
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def round_coordinate_array(coords, precision):
+    """
+    Round a float64 array of coordinates to the given number of decimals,
+    giving the same values as Python's round() on each value
+
+    Args:
+        coords (np.ndarray): float64 array of coordinates
+        precision (int): Number of decimal places to keep
+
+    Returns:
+        np.ndarray: New float64 array of rounded coordinates
+    """
+    scale = 10.0**precision
+    scaled = coords * scale
+    rounded_scaled = np.rint(scaled)
+    rounded = rounded_scaled / scale
+
+    # Scaling can move values that are close to halfway between two results
+    # across the halfway point, so those are rounded exactly by Python
+    near_half = np.abs(np.abs(scaled - rounded_scaled) - 0.5) < 1e-3
+    rounded[near_half] = [
+        round(value, precision) for value in coords[near_half].tolist()
+    ]
+    return rounded
+
+
+class FeatureCollectionWriter:
+    """
+    Write a GeoJSON FeatureCollection one feature at a time, so output never
+    has to be accumulated in memory before it is encoded.
+
+    Features are written to a temporary file next to the output, which
+    replaces the output only when the block exits without an exception, so a
+    failed run never leaves a truncated but valid-looking collection behind.
+
+    Usage:
+        with FeatureCollectionWriter(path) as writer:
+            for feature in features:
+                writer.write(feature)
+    """
+
+    def __init__(self, filepath, indent=False, members=None):
+        """
+        Args:
+            filepath (str): Path to the output GeoJSON file
+            indent (bool): Write the same 2-space indented layout as
+                orjson.OPT_INDENT_2 instead of compact JSON
+            members (dict): Optional extra top-level members, such as bbox
+                or crs, written after "type" and before the features
+        """
+        self.filepath = filepath
+        self.indent = indent
+        self.members = members or {}
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._temp_path = f"{self.filepath}.tmp"
+        self._file = open(self._temp_path, "wb", buffering=WRITE_BUFFER_SIZE)
+        self._write_header()
+        return self
+
+    def _write_header(self):
+        if self.indent:
+            self._file.write(b'{\n  "type": "FeatureCollection",\n')
+            for key, value in self.members.items():
+                encoded = orjson.dumps(value, option=orjson.OPT_INDENT_2)
+                self._file.write(b"  " + orjson.dumps(key) + b": ")
+                self._file.write(encoded.replace(b"\n", b"\n  ") + b",\n")
+            self._file.write(b'  "features": [')
+        else:
+            self._file.write(b'{"type":"FeatureCollection",')
+            for key, value in self.members.items():
+                self._file.write(orjson.dumps(key) + b":" + orjson.dumps(value) + b",")
+            self._file.write(b'"features":[')
+
+    def _write_footer(self):
+        if not self.indent:
+            self._file.write(b"]}")
+        elif self.count:
+            self._file.write(b"\n  ]\n}")
+        else:
+            self._file.write(b"]\n}")
+
+    def write(self, feature):
+        """
+        Encode and append a single feature to the collection.
+
+        Args:
+            feature (dict): GeoJSON feature
+        """
+        if self.indent:
+            # Features sit two levels deep, so every line is indented by 4
+            encoded = orjson.dumps(feature, option=orjson.OPT_INDENT_2)
+            self._file.write(b",\n    " if self.count else b"\n    ")
+            self._file.write(encoded.replace(b"\n", b"\n    "))
+        else:
+            if self.count:
+                self._file.write(b",")
+            self._file.write(orjson.dumps(feature))
+        self.count += 1
+
+    def write_encoded(self, encoded_features):
+        """
+        Append features that were already encoded as compact JSON, e.g. by a
+        worker process, without decoding them again.
+
+        Args:
+            encoded_features (list[bytes]): Compact orjson-encoded features
+        """
+        if not encoded_features:
+            return
+        if self.indent:
+            # Indented output needs each feature re-encoded with its layout
+            for encoded in encoded_features:
+                self.write(orjson.loads(encoded))
+            return
+        if self.count:
+            self._file.write(b",")
+        self._file.write(b",".join(encoded_features))
+        self.count += len(encoded_features)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Discard the partial output instead of closing the collection
+            self._file.close()
+            os.remove(self._temp_path)
+            return False
+        self._write_footer()
+        self._file.close()
+        os.replace(self._temp_path, self.filepath)
+        return False
+
+
+class FeatureSequenceWriter(FeatureCollectionWriter):
+    """
+    Write newline-delimited GeoJSON (GeoJSONSeq): one compact feature per
+    line with no enclosing FeatureCollection, so the output can be read back
+    a line at a time. Used the same way as FeatureCollectionWriter.
+    """
+
+    def __init__(self, filepath):
+        """
+        Args:
+            filepath (str): Path to the output GeoJSONSeq file
+        """
+        super().__init__(filepath)
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def write(self, feature):
+        """
+        Encode and append a single feature as its own line.
+
+        Args:
+            feature (dict): GeoJSON feature
+        """
+        self._file.write(orjson.dumps(feature, option=orjson.OPT_APPEND_NEWLINE))
+        self.count += 1
+
+    def write_encoded(self, encoded_features):
+        """
+        Append features that were already encoded as compact JSON, each as
+        its own line.
+
+        Args:
+            encoded_features (list[bytes]): Compact orjson-encoded features
+        """
+        for encoded in encoded_features:
+            self._file.write(encoded)
+            self._file.write(b"\n")
+        self.count += len(encoded_features)
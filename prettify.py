@@ -1,6 +1,7 @@
-import json
+import orjson
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
 
 
 def prettify_geojson_file(input_file, output_file=None):
@@ -10,21 +11,25 @@ def prettify_geojson_file(input_file, output_file=None):
     Args:
         input_file (str): Path to input GeoJSON file
         output_file (str): Path to output file (if None, overwrites input)
+
+    Returns:
+        tuple: (feature_count, file_size) of the written file, or None if the
+            file could not be prettified
     """
     if not os.path.exists(input_file):
         print(f"Warning: {input_file} not found, skipping...")
-        return False
+        return None
 
     try:
         # Read the file
         print(f"Prettifying {input_file}...")
-        with open(input_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(input_file, "rb") as f:
+            data = orjson.loads(f.read())
 
         # Write back with pretty formatting
         output_path = output_file if output_file else input_file
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, separators=(",", ": "))
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
         # Get file size info
         file_size = os.path.getsize(output_path)
@@ -34,14 +39,14 @@ def prettify_geojson_file(input_file, output_file=None):
         print(f"    Features: {feature_count:,}")
         print(f"    Size: {file_size:,} bytes ({file_size/1024/1024:.1f} MB)")
 
-        return True
+        return feature_count, file_size
 
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"Error: Invalid JSON in {input_file}: {e}")
-        return False
+        return None
     except Exception as e:
         print(f"Error processing {input_file}: {e}")
-        return False
+        return None
 
 
 def prettify_railways_valid_files():
@@ -79,18 +84,19 @@ def prettify_railways_valid_files():
     total_features = 0
     total_size = 0
 
-    for file in sorted(files):
-        if prettify_geojson_file(file):
+    # Files are independent, so each one is prettified in its own process
+    files = sorted(files)
+    with ProcessPoolExecutor(max_workers=len(files)) as executor:
+        results = list(executor.map(prettify_geojson_file, files))
+
+    for result in results:
+        if result is not None:
             success_count += 1
 
             # Add to totals
-            try:
-                with open(file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                total_features += len(data.get("features", []))
-                total_size += os.path.getsize(file)
-            except:
-                pass
+            feature_count, file_size = result
+            total_features += feature_count
+            total_size += file_size
         print()
 
     print("=" * 50)
@@ -117,7 +123,7 @@ def prettify_specific_files(file_list):
 
     success_count = 0
     for file in file_list:
-        if prettify_geojson_file(file):
+        if prettify_geojson_file(file) is not None:
             success_count += 1
         print()
 